@@ -1,20 +1,42 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import functools
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, ConfigDict
 import uvicorn
+import json
 import logging
 import os
-from typing import Dict, Optional
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
 from pathlib import Path
-from ancient_arch_extractor import AncientArchExtractor
-from mlp_inference import HybridInference, MLPInference
-from resnet_hybrid_pipeline import HybridClassifier, HybridConfig, HybridFeatureExtractor
-import joblib
+from ancient_arch_extractor import (
+    CACHE_NAMESPACE,
+    FEATURE_KEYS,
+    ROYAL_RATIO_KEYS,
+    STATUS_OK,
+    AncientArchExtractor,
+    UnreadableImageError,
+    resolve_feature_keys,
+)
+from feature_cache import FeatureCache
+from model_registry import ModelRegistry
+from prefork import fork_supported, serve_prefork
+from stage_metrics import STAGE_METRICS, PrometheusText, StageMetrics, process_rss_bytes
+from task_pool import TaskPool
+from training_jobs import JobContext, TrainingJobs
+from training_store import TrainingFeatureStore
+import cv2
 import numpy as np
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.neural_network import MLPClassifier
-from sklearn.metrics import accuracy_score
+
+# pandas, sklearn, joblib and the torch/ResNet pipeline are imported where
+# they are used (training, model loading), so the server starts accepting
+# connections without them; the startup warm-up pulls them in afterwards.
+if TYPE_CHECKING:
+    from resnet_hybrid_pipeline import HybridFeatureExtractor, ResNet18FeatureExtractor
 
 logging.basicConfig(
     level=logging.INFO,
@@ -26,16 +48,143 @@ IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
 WRAPPER_DIRS = {"dataset_fixed", "dataset", "images", "imgs"}
 DEFAULT_DATASET_DIR = str((Path(__file__).resolve().parent.parent / "datasets").resolve())
 DEFAULT_MODEL_DIR = str((Path(__file__).resolve().parent / "models").resolve())
+# Images per batch task; each task reuses one model.
+BATCH_CHUNK_SIZE = 8
+
+
+def _upload_max_bytes_from_env() -> int:
+    try:
+        return int(float(os.getenv("ACASB_UPLOAD_MAX_MB", "50").strip() or 50) * 1024 * 1024)
+    except ValueError:
+        return 50 * 1024 * 1024
+
+
+UPLOAD_MAX_BYTES = _upload_max_bytes_from_env()
+
+
+def _resnet_batching_from_env() -> Tuple[int, float]:
+    try:
+        batch_size = int(os.getenv("ACASB_RESNET_BATCH_SIZE", "8").strip() or 8)
+    except ValueError:
+        batch_size = 8
+    try:
+        wait_ms = float(os.getenv("ACASB_RESNET_BATCH_WAIT_MS", "5").strip() or 5)
+    except ValueError:
+        wait_ms = 5.0
+    return batch_size, wait_ms
+
+
+RESNET_BATCH_SIZE, RESNET_BATCH_WAIT_MS = _resnet_batching_from_env()
+
+
+def _training_loader_from_env() -> Tuple[int, Optional[int]]:
+    try:
+        batch_size = int(os.getenv("ACASB_TRAIN_RESNET_BATCH", "32").strip() or 32)
+    except ValueError:
+        batch_size = 32
+    try:
+        workers = os.getenv("ACASB_TRAIN_LOADER_WORKERS", "").strip()
+        return batch_size, int(workers) if workers else None
+    except ValueError:
+        return batch_size, None
+
+
+# Hybrid training: backbone batch size and image decoding workers (None: from the job's CPU budget).
+TRAIN_RESNET_BATCH, TRAIN_LOADER_WORKERS = _training_loader_from_env()
+
+
+def _cv_jobs_from_env() -> Optional[int]:
+    try:
+        cv_jobs = os.getenv("ACASB_TRAIN_CV_JOBS", "").strip()
+        return int(cv_jobs) if cv_jobs else None
+    except ValueError:
+        return None
+
+
+# Hybrid cross-validation folds fit in parallel (None: one per training CPU, at most one per fold).
+TRAIN_CV_JOBS = _cv_jobs_from_env()
+
+feature_cache = FeatureCache.from_env()
+extractor = AncientArchExtractor(feature_cache=feature_cache)
+# Per-image training features, so a retrain only extracts new or changed images.
+training_store = TrainingFeatureStore.from_env()
+
+# Request work runs in task_pool (ACASB_POOL_MODE / ACASB_POOL_WORKERS) so the
+# event loop stays free for /health. Training runs as background jobs in
+# their own low-priority process (training_jobs, below run_training).
+task_pool = TaskPool.from_env()
+
+
+def _warmup_enabled_from_env() -> bool:
+    return os.getenv("ACASB_WARMUP", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+WARMUP_ENABLED = _warmup_enabled_from_env()
+
+# Readiness for /ready, separate from liveness (/health): "warming" until the
+# startup warm-up has loaded the default models and run one inference
+# through each, then "ready" (or "failed").
+readiness: Dict = {"status": "warming" if WARMUP_ENABLED else "ready", "models": {}, "seconds": None, "error": None}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARMUP_ENABLED:
+        threading.Thread(target=warm_up, name="acasb-warmup", daemon=True).start()
+    yield
+    task_pool.shutdown(wait=False)
+    training_jobs.shutdown()
+
 
 app = FastAPI(
     title="Order-Decoder API",
     description="Ancient building classification using ML",
-    version="3.0.0"
+    version="3.0.0",
+    lifespan=lifespan
 )
 
-extractor = AncientArchExtractor()
-inference = MLPInference()
-hybrid_inference = HybridInference()
+
+# Per-endpoint latency (time to response start for streamed batches) and
+# counts by status code, for /metrics.
+request_metrics = StageMetrics()
+request_counts: Dict[Tuple[str, str, int], int] = {}
+request_counts_lock = threading.Lock()
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", "unmatched")
+        request_metrics.observe(f"{request.method} {endpoint}", time.perf_counter() - start)
+        with request_counts_lock:
+            key = (request.method, endpoint, status_code)
+            request_counts[key] = request_counts.get(key, 0) + 1
+
+
+class ApiError(Exception):
+    """
+    HTTP error raised inside pool tasks. Unlike HTTPException it survives
+    pickling back from a worker process.
+    """
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+async def run_task(pool: TaskPool, func, *args):
+    try:
+        return await pool.run(func, *args)
+    except ApiError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
 
 def infer_label(image_path: Path, base_dir: Path) -> str:
@@ -59,21 +208,35 @@ def collect_hybrid_samples(base_dir: str) -> list[tuple[Path, str]]:
 
 
 def build_hybrid_feature_matrix(
-    feature_extractor: HybridFeatureExtractor,
+    feature_extractor: "HybridFeatureExtractor",
     samples: list[tuple[Path, str]],
     augment_factor: int,
+    progress: Optional[Callable[[int], None]] = None,
+    batch_size: int = 32,
+    workers: int = 0,
 ) -> tuple[np.ndarray, np.ndarray]:
-    features: list[np.ndarray] = []
-    labels: list[str] = []
+    """Images that fail to load are left out of the matrix."""
+    from resnet_hybrid_pipeline import HYBRID_STORE_NAMESPACE
 
-    for image_path, label in samples:
-        features.append(feature_extractor.extract_features(image_path, augmented=False))
-        labels.append(label)
-        for _ in range(max(augment_factor, 0)):
-            features.append(feature_extractor.extract_features(image_path, augmented=True))
-            labels.append(label)
+    views = 1 + max(augment_factor, 0)
+    paths = [str(image_path) for image_path, _ in samples]
 
-    return np.vstack(features), np.array(labels)
+    def extract(chunk: List[str], chunk_progress: Callable[[int], None]) -> List[Optional[np.ndarray]]:
+        return feature_extractor.extract_views_batch(
+            chunk, augment_factor, batch_size=batch_size, workers=workers, progress=chunk_progress
+        )
+
+    if training_store is None:
+        rows = extract(paths, progress or (lambda done: None))
+    else:
+        rows, _ = training_store.load_or_extract(
+            HYBRID_STORE_NAMESPACE, feature_extractor.cache_version, paths, extract, views=views, progress=progress
+        )
+    kept = [index for index, row in enumerate(rows) if row is not None]
+    if not kept:
+        raise ValueError("No hybrid features could be extracted")
+    labels = np.array([samples[index][1] for index in kept])
+    return np.vstack([rows[index] for index in kept]), np.repeat(labels, views)
 
 class ApiBaseModel(BaseModel):
     model_config = ConfigDict(protected_namespaces=())
@@ -93,6 +256,26 @@ class PredictRequest(ApiBaseModel):
     model_type: str = "mlp"
     model_path: Optional[str] = None
     device: str = "cpu"
+    # /analyze only: compute just these features (default: all 19)
+    features: Optional[List[str]] = None
+
+class BatchRequest(ApiBaseModel):
+    image_paths: Optional[List[str]] = None
+    directory: Optional[str] = None
+    recursive: bool = False
+    model_type: str = "mlp"
+    model_path: Optional[str] = None
+    device: str = "cpu"
+    # /analyze/batch only
+    features: Optional[List[str]] = None
+
+class UploadOptions(ApiBaseModel):
+    # Query parameters of the /*/upload endpoints; the image is the body.
+    filename: str = "upload"
+    model_type: str = "mlp"
+    model_path: Optional[str] = None
+    device: str = "cpu"
+    features: Optional[List[str]] = None
 
 class TrainResponse(ApiBaseModel):
     success: bool
@@ -106,6 +289,25 @@ class TrainResponse(ApiBaseModel):
     cross_val_accuracy: Optional[float] = None
     cross_val_std: Optional[float] = None
 
+class TrainJobResponse(ApiBaseModel):
+    job_id: str
+    status: str
+    model_type: str
+    params: Dict = {}
+    phase: Optional[str] = None
+    images_done: int = 0
+    images_total: int = 0
+    fold: int = 0
+    folds: int = 0
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    elapsed_seconds: float = 0.0
+    # Estimated time left in the current phase (extraction or CV).
+    eta_seconds: Optional[float] = None
+    result: Optional[TrainResponse] = None
+    error: Optional[str] = None
+
 class PredictResponse(ApiBaseModel):
     success: bool
     message: str
@@ -140,26 +342,169 @@ class AnalyzeResponse(ApiBaseModel):
     asm: float = None
     royal_ratio: float = None
 
+class AnalyzePredictResponse(AnalyzeResponse):
+    model_type: Optional[str] = None
+    probabilities: Optional[Dict[str, float]] = None
+    prediction_success: Optional[bool] = None
+    prediction_message: Optional[str] = None
+
 @app.get("/health")
 async def health_check() -> Dict[str, str]:
     logger.info("Health check received")
     return {"status": "healthy", "message": "API is ready"}
 
-@app.post("/train", response_model=TrainResponse)
+@app.get("/ready")
+async def ready_check() -> JSONResponse:
+    """Readiness: 200 once the warm-up finished, 503 while warming up or after it failed."""
+    return JSONResponse(status_code=200 if readiness["status"] == "ready" else 503, content=readiness)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """
+    Prometheus text exposition. Values cover this process: in process pool
+    mode extraction stage timings recorded inside workers are not included.
+    """
+    page = PrometheusText()
+
+    with request_counts_lock:
+        counts = sorted(request_counts.items())
+    page.sample(
+        "acasb_http_requests_total", "counter", "HTTP requests by endpoint and status code.",
+        (({"method": method, "endpoint": endpoint, "status": str(status)}, count) for (method, endpoint, status), count in counts)
+    )
+    page.histograms(
+        "acasb_http_request_duration_seconds", "HTTP request latency by endpoint.",
+        (({"method": key.split(" ", 1)[0], "endpoint": key.split(" ", 1)[1]}, snapshot)
+         for key, snapshot in sorted(request_metrics.snapshot().items()))
+    )
+    page.histograms(
+        "acasb_stage_duration_seconds",
+        "Extraction and inference stage latency (decode, preprocess, colour, edges, glcm, resnet_forward, classifier...).",
+        (({"stage": stage}, snapshot) for stage, snapshot in sorted(STAGE_METRICS.snapshot().items()))
+    )
+
+    page.histograms(
+        "acasb_model_load_duration_seconds", "Model load latency by model type.",
+        (({"model_type": model_type}, snapshot) for model_type, snapshot in sorted(model_registry.load_metrics.snapshot().items()))
+    )
+    page.sample(
+        "acasb_model_events_total", "counter", "Model pool events (load_failed, reload, reload_failed, eviction).",
+        (({"event": event}, count) for event, count in sorted(model_registry.event_counts().items()))
+    )
+    pool_stats = model_registry.stats()
+    page.sample("acasb_model_pool_models", "gauge", "Models currently loaded in the pool.", [({}, pool_stats["models"])])
+    page.sample("acasb_model_pool_bytes", "gauge", "Estimated size of the loaded models.", [({}, pool_stats["bytes"])])
+
+    with resnet_extractors_lock:
+        batchers = [(device, e.batcher.stats()) for device, e in resnet_extractors.items() if e.batcher is not None]
+    page.sample(
+        "acasb_resnet_batches_total", "counter", "Batched ResNet forward passes.",
+        (({"device": device}, stats["batches"]) for device, stats in batchers)
+    )
+    page.sample(
+        "acasb_resnet_batch_items_total", "counter", "Images run through batched ResNet forward passes.",
+        (({"device": device}, stats["items"]) for device, stats in batchers)
+    )
+
+    if feature_cache is not None:
+        lookups = feature_cache.lookup_counts()
+        page.sample(
+            "acasb_feature_cache_lookups_total", "counter", "Feature cache lookups by namespace and result (hit/miss).",
+            (({"namespace": namespace, "result": result}, count)
+             for namespace, counts in sorted(lookups.items()) for result, count in counts.items())
+        )
+        page.sample("acasb_feature_cache_bytes", "gauge", "Bytes of feature vectors in the persistent cache.", [({}, feature_cache.total_bytes())])
+
+    page.sample(
+        "acasb_pool_in_flight", "gauge", "Tasks submitted to a worker pool and not finished.",
+        [({"pool": task_pool.name}, task_pool.in_flight)]
+    )
+    page.sample(
+        "acasb_pool_queue_depth", "gauge", "Tasks waiting for a free worker.",
+        [({"pool": task_pool.name}, task_pool.queue_depth)]
+    )
+    page.sample(
+        "acasb_training_jobs", "gauge", "Training jobs kept in the job list, by status.",
+        (({"status": status}, count) for status, count in training_jobs.counts().items())
+    )
+
+    rss = process_rss_bytes()
+    if rss is not None:
+        page.sample("acasb_process_resident_memory_bytes", "gauge", "Resident set size of the API process.", [({}, rss)])
+
+    return PlainTextResponse(page.render(), media_type=PrometheusText.content_type)
+
+@app.post("/train", response_model=TrainJobResponse, status_code=202)
 async def train_model(request: TrainRequest) -> Dict:
+    """Queue a training job and return at once; poll /train/jobs/{job_id}."""
+    model_type = (request.model_type or "mlp").strip().lower()
+    return training_jobs.submit(request, model_type, params=request.model_dump())
+
+@app.get("/train/jobs", response_model=List[TrainJobResponse])
+async def list_training_jobs(limit: int = Query(20, ge=1)) -> List[Dict]:
+    return training_jobs.list(limit)
+
+@app.get("/train/jobs/{job_id}", response_model=TrainJobResponse)
+async def get_training_job(job_id: str) -> Dict:
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Training job not found: {job_id}")
+    return job
+
+@app.post("/train/jobs/{job_id}/cancel", response_model=TrainJobResponse)
+async def cancel_training_job(job_id: str, response: Response) -> Dict:
+    job = training_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Training job not found: {job_id}")
+    if job["status"] == "running":
+        # Stops at its next progress report.
+        response.status_code = 202
+    return job
+
+def run_training(request: TrainRequest, job: Optional[JobContext] = None) -> Dict:
+    """
+    Train and save a model. Runs inside a training job process; ``job``
+    receives progress and raises ``JobCancelled`` once the job is cancelled.
+    """
+    import joblib
+    import pandas as pd
+    from resnet_hybrid_pipeline import HybridClassifier, HybridConfig, HybridFeatureExtractor
+    from sklearn.metrics import accuracy_score
+    from sklearn.model_selection import train_test_split
+    from sklearn.neural_network import MLPClassifier
+    from sklearn.preprocessing import StandardScaler
+    from training_jobs import JobCancelled
+
+    def report(phase: Optional[str] = None, **fields) -> None:
+        if job is not None:
+            job.report(phase, **fields)
+
     try:
         model_type = (request.model_type or "mlp").strip().lower()
         base_dir = request.base_dir
         save_dir = request.save_dir
+        report("scanning")
 
         if model_type == "hybrid":
             logger.info("Training experimental ResNet18 + SVM/MLP hybrid model...")
             samples = collect_hybrid_samples(base_dir)
             if not samples:
-                raise HTTPException(status_code=400, detail="No valid samples found in dataset")
-
-            hybrid_extractor = HybridFeatureExtractor(device=request.device or "cpu")
-            X, y = build_hybrid_feature_matrix(hybrid_extractor, samples, request.augment_factor)
+                raise ApiError(status_code=400, detail="No valid samples found in dataset")
+
+            report("extracting", images_done=0, images_total=len(samples))
+            hybrid_extractor = HybridFeatureExtractor(device=request.device or "cpu", feature_cache=feature_cache)
+            if TRAIN_LOADER_WORKERS is not None:
+                loader_workers = max(0, TRAIN_LOADER_WORKERS)
+            else:
+                loader_workers = max(0, min(4, (job.cpus if job is not None else os.cpu_count() or 1) - 1))
+            X, y = build_hybrid_feature_matrix(
+                hybrid_extractor,
+                samples,
+                request.augment_factor,
+                progress=lambda done: report(images_done=done, images_total=len(samples)),
+                batch_size=TRAIN_RESNET_BATCH,
+                workers=loader_workers,
+            )
             logger.info("Hybrid feature matrix shape: %s", X.shape)
 
             pca_components = float(request.pca_components) if "." in request.pca_components else int(request.pca_components)
@@ -169,8 +514,18 @@ async def train_model(request: TrainRequest) -> Dict:
                 svm_c=request.svm_c,
             )
             classifier = HybridClassifier(config=config)
-            cv_result = classifier.cross_validate(X, y, n_splits=5)
+            cpus = job.cpus if job is not None else os.cpu_count() or 1
+            cv_jobs = max(1, min(5, TRAIN_CV_JOBS if TRAIN_CV_JOBS is not None else cpus))
+            cv_result = classifier.cross_validate(
+                X,
+                y,
+                n_splits=5,
+                on_fold=lambda fold, folds: report("cross_validating", fold=fold, folds=folds),
+                n_jobs=cv_jobs,
+                threads_per_fold=max(1, cpus // cv_jobs),
+            )
 
+            report("fitting")
             X_train, X_test, y_train, y_test = train_test_split(
                 X, y, test_size=0.2, random_state=config.random_state, stratify=y
             )
@@ -178,6 +533,7 @@ async def train_model(request: TrainRequest) -> Dict:
             y_pred = classifier.predict(X_test)
             accuracy = accuracy_score(y_test, y_pred)
 
+            report("saving")
             os.makedirs(save_dir, exist_ok=True)
             model_path = os.path.join(save_dir, "resnet_hybrid_bundle.pkl")
             classifier.save(model_path)
@@ -199,7 +555,8 @@ async def train_model(request: TrainRequest) -> Dict:
 
         logger.info(f"Scanning dataset in: {base_dir}")
 
-        data = []
+        image_paths = []
+        categories = []
 
         for category in ["royal", "civilian"]:
             category_dir = os.path.join(base_dir, category)
@@ -210,44 +567,52 @@ async def train_model(request: TrainRequest) -> Dict:
 
             for filename in os.listdir(category_dir):
                 if filename.endswith(('.jpg', '.jpeg', '.png')):
-                    image_path = os.path.join(category_dir, filename)
+                    image_paths.append(os.path.join(category_dir, filename))
+                    categories.append(category)
 
-                    try:
-                        feature_dict, feature_vector = extractor.extract_features(image_path)
+        report("extracting", images_done=0, images_total=len(image_paths))
+        workers = job.cpus if job is not None else None
 
-                        label = 1 if category == "royal" else 0
+        def progress(done: int) -> None:
+            report(images_done=done, images_total=len(image_paths))
 
-                        data.append({
-                            'image_path': image_path,
-                            'category': category,
-                            'label': label,
-                            **feature_dict
-                        })
+        def extract(chunk: List[str], chunk_progress: Callable[[int], None]) -> List[Optional[np.ndarray]]:
+            matrix, chunk_status = extractor.extract_features_batch(chunk, workers=workers, progress=chunk_progress)
+            return [row if row_status == STATUS_OK else None for row, row_status in zip(matrix, chunk_status)]
 
-                        logger.info(f"Processed: {filename}")
+        if training_store is None:
+            feature_matrix, status = extractor.extract_features_batch(image_paths, workers=workers, progress=progress)
+            ok = status == STATUS_OK
+        else:
+            rows, _ = training_store.load_or_extract(
+                CACHE_NAMESPACE, f"{extractor.cache_version}/keys={','.join(FEATURE_KEYS)}", image_paths, extract, progress=progress
+            )
+            ok = np.array([row is not None for row in rows], dtype=bool)
+            feature_matrix = np.zeros((len(image_paths), len(FEATURE_KEYS)), dtype=np.float32)
+            for index, row in enumerate(rows):
+                if row is not None:
+                    feature_matrix[index] = row[0]
 
-                    except Exception as e:
-                        logger.error(f"Failed to process {filename}: {e}")
+        for image_path, row_ok in zip(image_paths, ok):
+            if not row_ok:
+                logger.error(f"Failed to process {os.path.basename(image_path)}")
 
-        df = pd.DataFrame(data)
+        df = pd.DataFrame(feature_matrix[ok], columns=FEATURE_KEYS)
+        df.insert(0, 'image_path', np.asarray(image_paths, dtype=object)[ok])
+        df.insert(1, 'category', np.asarray(categories, dtype=object)[ok])
+        df.insert(2, 'label', (df['category'] == "royal").astype(int))
 
         logger.info(f"Total samples: {len(df)}")
         logger.info(f"Royal samples: {len(df[df['label'] == 1])}")
         logger.info(f"Civilian samples: {len(df[df['label'] == 0])}")
 
         if len(df) == 0:
-            raise HTTPException(status_code=400, detail="No valid samples found in dataset")
+            raise ApiError(status_code=400, detail="No valid samples found in dataset")
 
-        feature_keys = [
-            "ratio_yellow", "ratio_red_1", "ratio_red_2", "ratio_blue", "ratio_green",
-            "ratio_gray_white", "ratio_black",
-            "h_mean", "h_std", "s_mean", "s_std", "v_mean", "v_std",
-            "edge_density", "entropy", "contrast", "dissimilarity", "homogeneity", "asm"
-        ]
-
-        X = df[feature_keys].values
+        X = df[FEATURE_KEYS].values
         y = df['label'].values
 
+        report("fitting")
         scaler = StandardScaler()
         X_scaled = scaler.fit_transform(X)
 
@@ -285,6 +650,7 @@ async def train_model(request: TrainRequest) -> Dict:
         logger.info(f"Training accuracy: {accuracy:.4f}")
         logger.info(f"Model trained successfully!")
 
+        report("saving")
         os.makedirs(save_dir, exist_ok=True)
 
         model_path = os.path.join(save_dir, 'mlp_model.pkl')
@@ -311,119 +677,479 @@ async def train_model(request: TrainRequest) -> Dict:
 
         return result
         
-    except HTTPException:
+    except (ApiError, JobCancelled):
         raise
     except Exception as e:
         logger.error(f"Training failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Training failed: {str(e)}")
+        raise ApiError(status_code=500, detail=f"Training failed: {str(e)}")
+
+training_jobs = TrainingJobs.from_env(run_training)
 
 @app.post("/predict", response_model=PredictResponse)
 async def predict_image(request: PredictRequest) -> Dict:
+    return await run_task(task_pool, run_prediction, request)
+
+# One ResNet backbone per device, shared by every hybrid model in the pool.
+# Concurrent hybrid requests on the thread pool are coalesced into batched
+# forward passes (ACASB_RESNET_BATCH_SIZE / ACASB_RESNET_BATCH_WAIT_MS).
+resnet_extractors: Dict[str, "ResNet18FeatureExtractor"] = {}
+resnet_extractors_lock = threading.Lock()
+
+def shared_resnet_extractor(device: str) -> "ResNet18FeatureExtractor":
+    from resnet_hybrid_pipeline import ResNet18FeatureExtractor
+
+    with resnet_extractors_lock:
+        resnet_extractor = resnet_extractors.get(device)
+        if resnet_extractor is None:
+            resnet_extractor = resnet_extractors[device] = ResNet18FeatureExtractor(
+                device=device,
+                feature_cache=feature_cache,
+                max_batch_size=RESNET_BATCH_SIZE,
+                max_wait_ms=RESNET_BATCH_WAIT_MS
+            )
+        return resnet_extractor
+
+def build_inference(model_type: str, model_path: Optional[str], device: str):
+    from mlp_inference import HybridInference, MLPInference
+
+    if model_type == "hybrid":
+        inference = HybridInference(
+            device=device,
+            feature_cache=feature_cache,
+            resnet_provider=functools.partial(shared_resnet_extractor, device),
+            handcrafted_extractor=extractor
+        )
+    else:
+        inference = MLPInference(extractor=extractor)
+    if model_path:
+        inference.model_path = model_path
+    return inference
+
+# Bounded LRU pool of loaded models keyed by (model_type, model_path,
+# device), reloaded in the background when the files on disk are
+# retrained. In process mode each worker holds its own pool.
+model_registry = ModelRegistry.from_env(build_inference)
+
+def normalize_model_type(model_type: Optional[str]) -> str:
+    return "hybrid" if (model_type or "mlp").strip().lower() == "hybrid" else "mlp"
+
+def load_inference(request: PredictRequest):
+    model_type = normalize_model_type(request.model_type)
+    model = model_registry.get(model_type, request.model_path, request.device or "cpu")
+    if model is None:
+        if model_type == "hybrid":
+            raise ApiError(status_code=500, detail="Hybrid model bundle not found. Please train the hybrid model first.")
+        raise ApiError(status_code=500, detail="Model files not found. Please train the model first.")
+    return model
+
+def prediction_fields(result: Dict, model_type: str) -> Dict:
+    fields = {
+        "prediction": result["prediction"],
+        "confidence": result["confidence"],
+        "model_type": model_type
+    }
+    if model_type == "hybrid":
+        fields["probabilities"] = result.get("probabilities")
+    return fields
+
+def analysis_fields(feature_dict: Dict[str, float]) -> Dict:
+    fields = {key: round(value, 4) for key, value in feature_dict.items()}
+    # Fields outside a requested subset are left as None.
+    if all(key in feature_dict for key in ROYAL_RATIO_KEYS):
+        royal_ratio = sum(feature_dict[key] for key in ROYAL_RATIO_KEYS)
+        fields["royal_ratio"] = round(royal_ratio, 4)
+    return fields
+
+def run_prediction(request: PredictRequest) -> Dict:
     try:
         logger.info(f"Prediction request received: {request.image_path}")
         
         if not os.path.exists(request.image_path):
-            raise HTTPException(status_code=404, detail=f"Image file not found: {request.image_path}")
+            raise ApiError(status_code=404, detail=f"Image file not found: {request.image_path}")
 
-        model_type = (request.model_type or "mlp").strip().lower()
-        if model_type == "hybrid":
-            if request.model_path:
-                hybrid_inference.model_path = request.model_path
-            hybrid_inference.device = request.device or "cpu"
-            if not hybrid_inference.load_model():
-                logger.warning("Hybrid model not loaded, attempting to load...")
-                if not hybrid_inference.load_model():
-                    raise HTTPException(status_code=500, detail="Hybrid model bundle not found. Please train the hybrid model first.")
-
-            result = hybrid_inference.predict(request.image_path)
-            logger.info(f"Hybrid prediction completed: {result['prediction']}")
-            return {
-                "success": result["success"],
-                "message": result["message"],
-                "prediction": result["prediction"],
-                "confidence": result["confidence"],
-                "model_type": "hybrid",
-                "probabilities": result.get("probabilities")
-            }
-
-        if request.model_path:
-            inference.model_path = request.model_path
-
-        if not inference.load_model():
-            logger.warning("Model not loaded, attempting to load...")
-            if not inference.load_model():
-                raise HTTPException(status_code=500, detail="Model files not found. Please train the model first.")
-
-        result = inference.predict(request.image_path)
-
-        logger.info(f"Prediction completed: {result['prediction']}")
-
-        return {
-            "success": result["success"],
-            "message": result["message"],
-            "prediction": result["prediction"],
-            "confidence": result["confidence"],
-            "model_type": "mlp"
-        }
+        return predict_source(
+            request,
+            lambda model: model.predict(request.image_path, summary=False),
+            lambda model: model.predict(request.image_path)
+        )
         
-    except HTTPException:
+    except ApiError:
         raise
     except Exception as e:
         logger.error(f"Prediction failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+        raise ApiError(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+def predict_source(request, predict_mlp, predict_hybrid) -> Dict:
+    """Load the requested model and run the matching ``predict_*`` callable on it."""
+    model_type = normalize_model_type(request.model_type)
+    model = load_inference(request)
+    if model_type == "hybrid":
+        result = predict_hybrid(model)
+        logger.info(f"Hybrid prediction completed: {result['prediction']}")
+    else:
+        result = predict_mlp(model)
+        logger.info(f"Prediction completed: {result['prediction']}")
+
+    return {
+        "success": result["success"],
+        "message": result["message"],
+        **prediction_fields(result, model_type)
+    }
 
 @app.post("/analyze", response_model=AnalyzeResponse)
 async def analyze_image(request: PredictRequest) -> Dict:
+    return await run_task(task_pool, run_analysis, request)
+
+def run_analysis(request: PredictRequest) -> Dict:
     try:
         logger.info(f"Analyze request received: {request.image_path}")
         
         if not os.path.exists(request.image_path):
-            raise HTTPException(status_code=404, detail=f"Image file not found: {request.image_path}")
-        
-        feature_dict, feature_vector = extractor.extract_features(request.image_path)
+            raise ApiError(status_code=404, detail=f"Image file not found: {request.image_path}")
         
-        if len(feature_vector) == 0:
-            logger.error("Failed to extract features!")
-            raise HTTPException(status_code=500, detail="Failed to extract features")
+        return analyze_source(request, lambda features: extractor.extract_features(request.image_path, features))
         
-        royal_ratio = feature_dict.get('ratio_yellow', 0) + feature_dict.get('ratio_red_1', 0) + feature_dict.get('ratio_red_2', 0)
-        
-        result = {
+    except ApiError:
+        raise
+    except Exception as e:
+        logger.error(f"Analysis failed: {e}")
+        raise ApiError(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+def analyze_source(request, extract) -> Dict:
+    """``extract(features)`` returns the (dict, vector) pair from the extractor."""
+    try:
+        features = resolve_feature_keys(request.features)
+    except ValueError as e:
+        raise ApiError(status_code=400, detail=str(e))
+    
+    feature_dict, feature_vector = extract(features)
+    
+    if len(feature_vector) == 0:
+        logger.error("Failed to extract features!")
+        raise ApiError(status_code=500, detail="Failed to extract features")
+    
+    result = {
+        "success": True,
+        "message": "Analysis completed",
+        "prediction": None,
+        "confidence": None,
+        **analysis_fields(feature_dict)
+    }
+    
+    logger.info(f"Analysis completed: extracted {len(feature_dict)} features")
+    
+    return result
+
+def collect_batch_paths(request: BatchRequest) -> List[str]:
+    paths = [str(path) for path in request.image_paths or []]
+    if request.directory:
+        root = Path(request.directory)
+        if not root.is_dir():
+            raise ApiError(status_code=404, detail=f"Directory not found: {request.directory}")
+        entries = root.rglob("*") if request.recursive else root.iterdir()
+        paths.extend(
+            str(path) for path in sorted(entries)
+            if path.is_file() and path.suffix.lower() in IMAGE_SUFFIXES
+        )
+    if not paths:
+        raise ApiError(status_code=400, detail="No images given: pass image_paths or a directory containing images")
+    return paths
+
+def missing_image_line(image_path: str) -> Dict:
+    return {"image_path": image_path, "success": False, "message": f"Image file not found: {image_path}"}
+
+def run_analysis_chunk(features: List[str], paths: List[str]) -> List[Dict]:
+    found = [path for path in paths if os.path.exists(path)]
+    matrix, status = extractor.extract_features_chunk(found, features=features)
+    rows = {path: (row, row_status) for path, row, row_status in zip(found, matrix, status)}
+    
+    lines = []
+    for path in paths:
+        if path not in rows:
+            lines.append(missing_image_line(path))
+            continue
+        row, row_status = rows[path]
+        if row_status != STATUS_OK:
+            lines.append({"image_path": path, "success": False, "message": "Failed to extract features"})
+            continue
+        feature_dict = {key: float(value) for key, value in zip(features, row)}
+        lines.append({
+            "image_path": path,
             "success": True,
             "message": "Analysis completed",
-            "prediction": None,
-            "confidence": None,
-            "ratio_yellow": round(feature_dict.get('ratio_yellow', 0), 4),
-            "ratio_red_1": round(feature_dict.get('ratio_red_1', 0), 4),
-            "ratio_red_2": round(feature_dict.get('ratio_red_2', 0), 4),
-            "ratio_blue": round(feature_dict.get('ratio_blue', 0), 4),
-            "ratio_green": round(feature_dict.get('ratio_green', 0), 4),
-            "ratio_gray_white": round(feature_dict.get('ratio_gray_white', 0), 4),
-            "ratio_black": round(feature_dict.get('ratio_black', 0), 4),
-            "h_mean": round(feature_dict.get('h_mean', 0), 4),
-            "h_std": round(feature_dict.get('h_std', 0), 4),
-            "s_mean": round(feature_dict.get('s_mean', 0), 4),
-            "s_std": round(feature_dict.get('s_std', 0), 4),
-            "v_mean": round(feature_dict.get('v_mean', 0), 4),
-            "v_std": round(feature_dict.get('v_std', 0), 4),
-            "edge_density": round(feature_dict.get('edge_density', 0), 4),
-            "entropy": round(feature_dict.get('entropy', 0), 4),
-            "contrast": round(feature_dict.get('contrast', 0), 4),
-            "dissimilarity": round(feature_dict.get('dissimilarity', 0), 4),
-            "homogeneity": round(feature_dict.get('homogeneity', 0), 4),
-            "asm": round(feature_dict.get('asm', 0), 4),
-            "royal_ratio": round(royal_ratio, 4)
-        }
+            **analysis_fields(feature_dict)
+        })
+    return lines
+
+def run_prediction_chunk(request: BatchRequest, paths: List[str]) -> List[Dict]:
+    model_type = normalize_model_type(request.model_type)
+    model = load_inference(request)
+    
+    found = [path for path in paths if os.path.exists(path)]
+    if model_type == "hybrid":
+        # One batched ResNet pass for the whole chunk.
+        results = dict(zip(found, model.predict_batch(found)))
+    else:
+        keys = model.required_features(summary=False)
+        matrix, status = extractor.extract_features_chunk(found, features=keys)
+        results = {}
+        for path, row, row_status in zip(found, matrix, status):
+            if row_status != STATUS_OK:
+                results[path] = {"success": False, "message": "Failed to extract features"}
+                continue
+            results[path] = model.predict_features(dict(zip(keys, row.tolist())), summary=False)
+    
+    lines = []
+    for path in paths:
+        if path not in results:
+            lines.append(missing_image_line(path))
+            continue
+        result = results[path]
+        line = {"image_path": path, "success": result["success"], "message": result["message"]}
+        if result["success"]:
+            line.update(prediction_fields(result, model_type))
+        lines.append(line)
+    return lines
+
+def check_inference(request: BatchRequest) -> None:
+    load_inference(request)
+
+async def stream_batch(func, paths: List[str], *args):
+    """
+    Yield NDJSON lines as chunks finish. At most two chunks per worker are in
+    flight, so memory stays flat however many images the batch has.
+    """
+    chunks = iter([paths[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(paths), BATCH_CHUNK_SIZE)])
+    in_flight: Dict[asyncio.Future, List[str]] = {}
+    limit = 2 * task_pool.workers
+    try:
+        while True:
+            while len(in_flight) < limit:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                in_flight[asyncio.ensure_future(task_pool.run(func, *args, chunk))] = chunk
+            if not in_flight:
+                break
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                chunk = in_flight.pop(future)
+                try:
+                    lines = future.result()
+                except Exception as e:
+                    detail = e.detail if isinstance(e, ApiError) else str(e)
+                    logger.error(f"Batch chunk failed: {detail}")
+                    lines = [{"image_path": path, "success": False, "message": detail} for path in chunk]
+                for line in lines:
+                    yield json.dumps(line, ensure_ascii=False) + "\n"
+    finally:
+        # Client went away or the batch finished: drop chunks not started yet.
+        for future in in_flight:
+            future.cancel()
+
+@app.post("/analyze/batch")
+async def analyze_batch(request: BatchRequest) -> StreamingResponse:
+    try:
+        features = resolve_feature_keys(request.features)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    paths = await run_task(task_pool, collect_batch_paths, request)
+    logger.info(f"Batch analyze request received: {len(paths)} images")
+    return StreamingResponse(stream_batch(run_analysis_chunk, paths, features), media_type="application/x-ndjson")
+
+@app.post("/predict/batch")
+async def predict_batch(request: BatchRequest) -> StreamingResponse:
+    paths = await run_task(task_pool, collect_batch_paths, request)
+    logger.info(f"Batch prediction request received: {len(paths)} images")
+    await run_task(task_pool, check_inference, request)
+    return StreamingResponse(stream_batch(run_prediction_chunk, paths, request), media_type="application/x-ndjson")
+
+@app.post("/analyze_predict", response_model=AnalyzePredictResponse)
+async def analyze_and_predict(request: PredictRequest) -> Dict:
+    return await run_task(task_pool, run_analyze_predict, request)
+
+def run_analyze_predict(request: PredictRequest) -> Dict:
+    """
+    /analyze and /predict from a single handcrafted extraction. A missing or
+    broken model only fails the prediction part (prediction_success=false);
+    the feature fields are still returned. ``features`` is ignored here.
+    """
+    try:
+        logger.info(f"Analyze+predict request received: {request.image_path}")
         
-        logger.info(f"Analysis completed: extracted {len(feature_dict)} features")
+        if not os.path.exists(request.image_path):
+            raise ApiError(status_code=404, detail=f"Image file not found: {request.image_path}")
         
-        return result
+        return analyze_predict_source(
+            request,
+            lambda: extractor.extract_features(request.image_path),
+            lambda model, handcrafted: model.predict(request.image_path, handcrafted=handcrafted)
+        )
         
-    except HTTPException:
+    except ApiError:
+        raise
+    except Exception as e:
+        logger.error(f"Analyze+predict failed: {e}")
+        raise ApiError(status_code=500, detail=f"Analyze+predict failed: {str(e)}")
+
+def analyze_predict_source(request, extract, predict_hybrid) -> Dict:
+    """
+    ``extract()`` returns the full handcrafted (dict, vector) pair;
+    ``predict_hybrid(model, vector)`` runs a hybrid model reusing it.
+    """
+    feature_dict, feature_vector = extract()
+    
+    if len(feature_vector) == 0:
+        logger.error("Failed to extract features!")
+        raise ApiError(status_code=500, detail="Failed to extract features")
+    
+    model_type = normalize_model_type(request.model_type)
+    result = {
+        "success": True,
+        "message": "Analysis completed",
+        "model_type": model_type,
+        **analysis_fields(feature_dict)
+    }
+    
+    try:
+        model = load_inference(request)
+    except ApiError as e:
+        logger.warning(f"Prediction skipped: {e.detail}")
+        result.update(prediction_success=False, prediction_message=e.detail)
+        return result
+    
+    if model_type == "hybrid":
+        prediction = predict_hybrid(model, feature_vector)
+    else:
+        prediction = model.predict_features(feature_dict, summary=False)
+    
+    result.update(prediction_success=prediction["success"], prediction_message=prediction["message"])
+    if prediction["success"]:
+        result.update(prediction_fields(prediction, model_type))
+        result["message"] = "Analysis and prediction completed"
+    
+    logger.info(f"Analyze+predict completed: {result.get('prediction')}")
+    
+    return result
+
+async def read_upload(request: Request) -> Tuple[bytes, str]:
+    """
+    Image bytes from either a raw body (``application/octet-stream`` /
+    ``image/*``) or a multipart ``file`` field. Raw bodies never touch disk;
+    Starlette spools multipart parts over 1 MB to a temporary file.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {UPLOAD_MAX_BYTES} bytes")
+    
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        async with request.form(max_files=1) as form:
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(status_code=400, detail="Multipart upload needs a 'file' field")
+            data = await upload.read()
+            filename = upload.filename or "upload"
+    else:
+        data = await request.body()
+        filename = request.headers.get("x-filename", "upload")
+    
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty image upload")
+    if len(data) > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {UPLOAD_MAX_BYTES} bytes")
+    return data, filename
+
+def upload_options(
+    filename: str,
+    model_type: str,
+    model_path: Optional[str],
+    device: str,
+    features: Optional[List[str]]
+) -> UploadOptions:
+    # features may be repeated or comma-separated: ?features=a,b&features=c
+    keys = [key.strip() for value in features or [] for key in value.split(",") if key.strip()]
+    return UploadOptions(
+        filename=filename,
+        model_type=model_type,
+        model_path=model_path,
+        device=device,
+        features=keys or None
+    )
+
+@app.post("/predict/upload", response_model=PredictResponse)
+async def predict_upload(
+    request: Request,
+    model_type: str = "mlp",
+    model_path: Optional[str] = None,
+    device: str = "cpu"
+) -> Dict:
+    data, filename = await read_upload(request)
+    options = upload_options(filename, model_type, model_path, device, None)
+    return await run_task(task_pool, run_prediction_bytes, options, data)
+
+def run_prediction_bytes(request: UploadOptions, data: bytes) -> Dict:
+    try:
+        logger.info(f"Upload prediction request received: {request.filename} ({len(data)} bytes)")
+        return predict_source(
+            request,
+            lambda model: model.predict_from_bytes(data, summary=False),
+            lambda model: model.predict_from_bytes(data)
+        )
+    except UnreadableImageError:
+        logger.error(f"Cannot decode uploaded image: {request.filename}")
+        raise ApiError(status_code=422, detail=f"Cannot decode uploaded image: {request.filename}")
+    except ApiError:
+        raise
+    except Exception as e:
+        logger.error(f"Prediction failed: {e}")
+        raise ApiError(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+@app.post("/analyze/upload", response_model=AnalyzeResponse)
+async def analyze_upload(request: Request, features: Optional[List[str]] = Query(None)) -> Dict:
+    data, filename = await read_upload(request)
+    options = upload_options(filename, "mlp", None, "cpu", features)
+    return await run_task(task_pool, run_analysis_bytes, options, data)
+
+def run_analysis_bytes(request: UploadOptions, data: bytes) -> Dict:
+    try:
+        logger.info(f"Upload analyze request received: {request.filename} ({len(data)} bytes)")
+        return analyze_source(request, lambda features: extractor.extract_features_from_bytes(data, features, strict=True))
+    except UnreadableImageError:
+        logger.error(f"Cannot decode uploaded image: {request.filename}")
+        raise ApiError(status_code=422, detail=f"Cannot decode uploaded image: {request.filename}")
+    except ApiError:
         raise
     except Exception as e:
         logger.error(f"Analysis failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+        raise ApiError(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+@app.post("/analyze_predict/upload", response_model=AnalyzePredictResponse)
+async def analyze_and_predict_upload(
+    request: Request,
+    model_type: str = "mlp",
+    model_path: Optional[str] = None,
+    device: str = "cpu"
+) -> Dict:
+    data, filename = await read_upload(request)
+    options = upload_options(filename, model_type, model_path, device, None)
+    return await run_task(task_pool, run_analyze_predict_bytes, options, data)
+
+def run_analyze_predict_bytes(request: UploadOptions, data: bytes) -> Dict:
+    try:
+        logger.info(f"Upload analyze+predict request received: {request.filename} ({len(data)} bytes)")
+        return analyze_predict_source(
+            request,
+            lambda: extractor.extract_features_from_bytes(data, strict=True),
+            lambda model, handcrafted: model.predict_from_bytes(data, handcrafted=handcrafted)
+        )
+    except UnreadableImageError:
+        logger.error(f"Cannot decode uploaded image: {request.filename}")
+        raise ApiError(status_code=422, detail=f"Cannot decode uploaded image: {request.filename}")
+    except ApiError:
+        raise
+    except Exception as e:
+        logger.error(f"Analyze+predict failed: {e}")
+        raise ApiError(status_code=500, detail=f"Analyze+predict failed: {str(e)}")
 
 @app.get("/")
 async def root():
@@ -433,24 +1159,106 @@ async def root():
         "version": "3.0.0",
         "endpoints": {
             "GET /health": "Health check",
-            "POST /train": "Train local model (mlp or hybrid)",
+            "GET /ready": "Readiness (default models loaded and warmed up)",
+            "POST /train": "Start a background training job (mlp or hybrid), returns its job_id",
+            "GET /train/jobs": "Recent training jobs",
+            "GET /train/jobs/{job_id}": "Training job status and progress",
+            "POST /train/jobs/{job_id}/cancel": "Cancel a queued or running training job",
             "POST /predict": "Predict building type (mlp or hybrid)",
             "POST /analyze": "Extract handcrafted image features",
+            "POST /analyze_predict": "Handcrafted features and model prediction from one extraction",
+            "POST /predict/batch": "Predict many images (paths or a directory), streamed as NDJSON",
+            "POST /analyze/batch": "Extract features for many images, streamed as NDJSON",
+            "POST /predict/upload": "Predict from an uploaded image (raw body or multipart 'file')",
+            "POST /analyze/upload": "Extract features from an uploaded image",
+            "POST /analyze_predict/upload": "Features and prediction from an uploaded image",
+            "GET /metrics": "Prometheus metrics",
             "GET /": "API information"
         }
     }
 
+def preload_models() -> None:
+    """Load the default models (and the ResNet backbone) before forking workers."""
+    for model_type in ("mlp", "hybrid"):
+        if model_registry.get(model_type, None, "cpu") is None:
+            logger.info(f"No default {model_type} model to preload")
+
+def warm_up() -> None:
+    """
+    Load the default models and run one dummy inference through each, so the
+    first real request does not pay for imports, model loading, the ResNet
+    backbone or first-call allocations. A default model that is missing or
+    fails to load is reported in ``readiness["models"]`` but does not block
+    readiness; requests for it fail as they would without the warm-up.
+    """
+    started = time.perf_counter()
+    try:
+        image = np.random.default_rng(0).integers(0, 256, size=(224, 224, 3), dtype=np.uint8)
+        extractor.extract_features_from_array(image)
+        for model_type in ("mlp", "hybrid"):
+            inference = model_registry.get(model_type, None, "cpu")
+            if inference is not None:
+                inference.predict_from_array(image)
+                readiness["models"][model_type] = "loaded"
+            elif all(os.path.exists(path) for path in build_inference(model_type, None, "cpu").model_files()):
+                readiness["models"][model_type] = "load_failed"
+            else:
+                readiness["models"][model_type] = "missing"
+        readiness["seconds"] = round(time.perf_counter() - started, 3)
+        readiness["status"] = "ready"
+        logger.info(f"Warm-up finished in {readiness['seconds']:.2f}s, models: {readiness['models']}")
+    except Exception as e:
+        logger.error(f"Warm-up failed: {e}")
+        readiness["error"] = str(e)
+        readiness["status"] = "failed"
+
+def configure_worker(workers: int) -> Callable[[int], None]:
+    # Split the cores between workers instead of every worker sizing its
+    # thread pools for the whole machine.
+    share = max(1, (os.cpu_count() or 1) // workers)
+
+    def on_worker_start(index: int) -> None:
+        if not os.getenv("ACASB_POOL_WORKERS", "").strip():
+            task_pool.workers = share
+        cv2.setNumThreads(share)
+        torch = sys.modules.get("torch")
+        if torch is not None:
+            torch.set_num_threads(share)
+
+    return on_worker_start
+
 if __name__ == "__main__":
     host = os.getenv("ACASB_PYTHON_HOST", "127.0.0.1").strip() or "127.0.0.1"
     try:
         port = int(os.getenv("ACASB_PYTHON_PORT", "5000").strip() or "5000")
     except ValueError:
         port = 5000
-
-    logger.info("Starting Order-Decoder API service on %s:%s...", host, port)
-    uvicorn.run(
-        app,
-        host=host,
-        port=port,
-        log_level="info"
-    )
+    try:
+        workers = max(1, int(os.getenv("ACASB_PYTHON_WORKERS", "1").strip() or "1"))
+    except ValueError:
+        workers = 1
+
+    if workers > 1 and not fork_supported():
+        logger.warning("ACASB_PYTHON_WORKERS > 1 needs fork(); starting a single worker")
+        workers = 1
+    if workers > 1 and task_pool.mode == "process":
+        logger.warning("ACASB_POOL_MODE=process starts a process pool inside every worker")
+
+    logger.info("Starting Order-Decoder API service on %s:%s with %s worker(s)...", host, port, workers)
+    if workers > 1:
+        serve_prefork(
+            app,
+            host=host,
+            port=port,
+            workers=workers,
+            preload=preload_models,
+            on_worker_start=configure_worker(workers),
+            log_level="info"
+        )
+    else:
+        uvicorn.run(
+            app,
+            host=host,
+            port=port,
+            log_level="info"
+        )
@@ -0,0 +1,190 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = str((Path(__file__).resolve().parent / "cache").resolve())
+DEFAULT_CACHE_MB = 512
+
+CacheContent = Union[bytes, bytearray, memoryview, np.ndarray]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS features (
+    namespace TEXT NOT NULL,
+    version TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    dtype TEXT NOT NULL,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (namespace, version, digest)
+);
+CREATE INDEX IF NOT EXISTS features_last_access ON features (last_access);
+CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY CHECK (id = 0), total_bytes INTEGER NOT NULL);
+INSERT OR IGNORE INTO usage (id, total_bytes) VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS features_insert AFTER INSERT ON features BEGIN
+    UPDATE usage SET total_bytes = total_bytes + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS features_update AFTER UPDATE OF size ON features BEGIN
+    UPDATE usage SET total_bytes = total_bytes + NEW.size - OLD.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS features_delete AFTER DELETE ON features BEGIN
+    UPDATE usage SET total_bytes = total_bytes - OLD.size WHERE id = 0;
+END;
+"""
+
+
+class FeatureCache:
+    """
+    Persistent, content-addressed store for extracted feature vectors.
+
+    Entries are keyed by a hash of the image content plus a namespace
+    (``handcrafted``, ``resnet18``...) and the extractor's config version, so
+    a file that changes under the same name is simply a different key.
+    Storage is a SQLite database in WAL mode, which lets several server and
+    worker processes share one cache directory. When the stored vectors
+    exceed ``max_bytes`` the least recently used entries are evicted.
+
+    Cache failures are logged and treated as misses; they never fail an
+    extraction.
+    """
+
+    # Only rewrite last_access for entries that have not been touched for
+    # this long, so hot entries do not turn every read into a write.
+    touch_interval = 60.0
+    evict_to_fraction = 0.9
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_bytes)
+        self.db_path = os.path.join(cache_dir, "features.sqlite3")
+        self._local = threading.local()
+        # Per-namespace lookups in this process: {namespace: [hits, misses]}.
+        self._lookups: Dict[str, List[int]] = {}
+        self._lookups_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["FeatureCache"]:
+        """
+        Build the cache from ``ACASB_FEATURE_CACHE_DIR`` and
+        ``ACASB_FEATURE_CACHE_MB``. A size of 0 disables caching.
+        """
+        cache_dir = os.getenv("ACASB_FEATURE_CACHE_DIR", "").strip() or DEFAULT_CACHE_DIR
+        try:
+            size_mb = float(os.getenv("ACASB_FEATURE_CACHE_MB", str(DEFAULT_CACHE_MB)).strip() or DEFAULT_CACHE_MB)
+        except ValueError:
+            size_mb = DEFAULT_CACHE_MB
+        if size_mb <= 0:
+            return None
+        return cls(cache_dir, max_bytes=int(size_mb * 1024 * 1024))
+
+    def __getstate__(self):
+        return {"cache_dir": self.cache_dir, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state["cache_dir"], state["max_bytes"])
+
+    @staticmethod
+    def content_key(content: CacheContent) -> str:
+        hasher = hashlib.blake2b(digest_size=20)
+        if isinstance(content, np.ndarray):
+            hasher.update(f"{content.dtype.str}{content.shape}".encode("ascii"))
+            content = np.ascontiguousarray(content)
+        hasher.update(memoryview(content).cast("B"))
+        return hasher.hexdigest()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        # Connections must not cross a fork; reopen in each worker process.
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        os.makedirs(self.cache_dir, exist_ok=True)
+        connection = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(_SCHEMA)
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def get(self, namespace: str, key: str, version: str) -> Optional[np.ndarray]:
+        try:
+            connection = self._connection()
+            row = connection.execute(
+                "SELECT dtype, data FROM features WHERE namespace = ? AND version = ? AND digest = ?",
+                (namespace, version, key),
+            ).fetchone()
+            self._count_lookup(namespace, row is not None)
+            if row is None:
+                return None
+            now = time.time()
+            connection.execute(
+                "UPDATE features SET last_access = ? "
+                "WHERE namespace = ? AND version = ? AND digest = ? AND last_access < ?",
+                (now, namespace, version, key, now - self.touch_interval),
+            )
+            return np.frombuffer(row[1], dtype=np.dtype(row[0])).copy()
+        except sqlite3.Error as e:
+            logger.warning(f"Feature cache read failed: {e}")
+            self._count_lookup(namespace, False)
+            return None
+
+    def _count_lookup(self, namespace: str, hit: bool) -> None:
+        with self._lookups_lock:
+            counts = self._lookups.setdefault(namespace, [0, 0])
+            counts[0 if hit else 1] += 1
+
+    def lookup_counts(self) -> Dict[str, Dict[str, int]]:
+        """``{namespace: {"hit": n, "miss": n}}`` for lookups made by this process."""
+        with self._lookups_lock:
+            return {namespace: {"hit": hits, "miss": misses} for namespace, (hits, misses) in self._lookups.items()}
+
+    def put(self, namespace: str, key: str, version: str, vector: np.ndarray) -> None:
+        vector = np.ascontiguousarray(vector)
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute(
+                    "INSERT INTO features (namespace, version, digest, dtype, data, size, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (namespace, version, digest) DO UPDATE SET "
+                    "dtype = excluded.dtype, data = excluded.data, size = excluded.size, "
+                    "last_access = excluded.last_access",
+                    (namespace, version, key, vector.dtype.str, vector.tobytes(), vector.nbytes, time.time()),
+                )
+                self._evict(connection)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Feature cache write failed: {e}")
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        total = connection.execute("SELECT total_bytes FROM usage WHERE id = 0").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * self.evict_to_fraction)
+        # Least recently used first, only as many entries as it takes to get
+        # back under the target.
+        connection.execute(
+            "DELETE FROM features WHERE rowid IN ("
+            "SELECT rowid FROM (SELECT rowid, size, SUM(size) OVER (ORDER BY last_access, rowid) AS freed "
+            "FROM features) WHERE freed - size < ?)",
+            (total - target,),
+        )
+
+    def total_bytes(self) -> int:
+        try:
+            return int(self._connection().execute("SELECT total_bytes FROM usage WHERE id = 0").fetchone()[0])
+        except sqlite3.Error:
+            return 0
@@ -0,0 +1,175 @@
+import io
+import logging
+import struct
+from pathlib import Path
+from typing import BinaryIO, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ImageSource = Union[str, Path]
+ImageBuffer = Union[bytes, bytearray, memoryview]
+ImageInput = Union[str, Path, bytes, bytearray, memoryview, np.ndarray]
+
+# libjpeg can scale by 1/2, 1/4 and 1/8 while decoding DCT blocks.
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_JPEG_STANDALONE_MARKERS = {0x01, 0xD8} | set(range(0xD0, 0xD8))
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class BufferReader(io.RawIOBase):
+    """
+    Read-only, seekable file object over an in-memory buffer.
+    
+    Unlike ``io.BytesIO`` it never copies the underlying bytes, so header
+    parsing and PIL decoding can run directly on an upload body.
+    """
+    
+    def __init__(self, data: ImageBuffer):
+        super().__init__()
+        self._view = memoryview(data).cast("B")
+        self._position = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        chunk = self._view[self._position:self._position + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = max(0, offset)
+        return self._position
+    
+    def tell(self) -> int:
+        return self._position
+
+
+def _read_jpeg_size(stream: BinaryIO) -> Optional[Tuple[int, int]]:
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue
+        marker = stream.read(1)
+        while marker == b"\xff":
+            marker = stream.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        if code in _JPEG_STANDALONE_MARKERS:
+            continue
+        if code in (0xD9, 0xDA):
+            return None
+        length_bytes = stream.read(2)
+        if len(length_bytes) != 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if code in _JPEG_SOF_MARKERS:
+            header = stream.read(5)
+            if len(header) != 5:
+                return None
+            height, width = struct.unpack(">xHH", header)
+            return width, height
+        stream.seek(length - 2, io.SEEK_CUR)
+
+
+def _read_header(stream: BinaryIO) -> Optional[Tuple[str, int, int]]:
+    signature = stream.read(8)
+    if signature[:2] == b"\xff\xd8":
+        stream.seek(2)
+        size = _read_jpeg_size(stream)
+        return ("jpeg", *size) if size else None
+    if signature == _PNG_SIGNATURE:
+        chunk = stream.read(16)
+        if len(chunk) == 16 and chunk[4:8] == b"IHDR":
+            width, height = struct.unpack(">II", chunk[8:16])
+            return "png", width, height
+    return None
+
+
+def read_image_size(source: Union[ImageSource, ImageBuffer]) -> Optional[Tuple[str, int, int]]:
+    """
+    Return ``(format, width, height)`` from a file or encoded buffer header
+    without decoding pixels, or None for formats other than JPEG/PNG and
+    malformed headers.
+    """
+    try:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return _read_header(BufferReader(source))
+        with open(source, "rb") as stream:
+            return _read_header(stream)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def choose_reduced_decode(image_format: str, width: int, height: int, min_side: int) -> Tuple[int, int]:
+    """
+    Pick the largest libjpeg scale that keeps the shorter side at or above
+    ``min_side``. Returns ``(factor, imread_flag)``.
+    """
+    if image_format == "jpeg":
+        for factor, flag in REDUCED_DECODE_FLAGS:
+            if min(width, height) // factor >= min_side:
+                return factor, flag
+    return 1, cv2.IMREAD_COLOR
+
+
+def _as_bgr(image: np.ndarray) -> np.ndarray:
+    if image.dtype != np.uint8:
+        raise ValueError(f"Expected a uint8 image, got {image.dtype}")
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    if image.ndim == 3 and image.shape[2] == 3:
+        return image
+    if image.ndim == 3 and image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+    raise ValueError(f"Unsupported image shape: {image.shape}")
+
+
+def load_bgr_image(source: ImageInput, min_side: Optional[int] = None) -> Optional[np.ndarray]:
+    """
+    Decode an image as BGR like ``cv2.imread``.
+    
+    ``source`` may be a path, an encoded buffer (bytes, bytearray or
+    memoryview, decoded in memory without a copy) or an already decoded
+    uint8 array in BGR order, which is returned as-is. When ``min_side`` is
+    given, large JPEGs are decoded at a reduced scale that still leaves the
+    shorter side at least ``min_side`` pixels. Returns None if the input
+    cannot be decoded.
+    """
+    if isinstance(source, np.ndarray):
+        return _as_bgr(source)
+    
+    flag = cv2.IMREAD_COLOR
+    if min_side:
+        header = read_image_size(source)
+        if header is not None:
+            factor, flag = choose_reduced_decode(*header, min_side)
+            if factor > 1:
+                logger.debug("Reduced decode 1/%s (%sx%s)", factor, header[1], header[2])
+    
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        encoded = np.frombuffer(source, dtype=np.uint8)
+        if encoded.size == 0:
+            return None
+        return cv2.imdecode(encoded, flag)
+    return cv2.imread(str(source), flag)
@@ -0,0 +1,130 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class Ticket:
+    """Marks a caller that will submit soon; see ``MicroBatcher.expecting``."""
+
+    __slots__ = ("pending",)
+
+    def __init__(self):
+        self.pending = True
+
+
+class _Request:
+    __slots__ = ("item", "done", "result", "error")
+
+    def __init__(self, item: Any):
+        self.item = item
+        self.done = False
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent ``submit`` calls from different threads into one
+    ``run_batch(items) -> results`` call.
+
+    There is no background thread: the first waiting caller leads, collects
+    up to ``max_batch_size`` queued items and runs them, and the others wait
+    for their result. The leader only holds the batch open (for at most
+    ``max_wait_ms``) while other callers announced through ``expecting()``
+    are still preparing their item, so a lone request never waits.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[Sequence[Any]], Sequence[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+    ):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._cond = threading.Condition()
+        self._queue: List[_Request] = []
+        self._preparing = 0
+        self._leading = False
+        self.batches = 0
+        self.items = 0
+
+    @contextmanager
+    def expecting(self) -> Iterator[Ticket]:
+        """Announce an upcoming ``submit``; pass the ticket to it."""
+        ticket = Ticket()
+        with self._cond:
+            self._preparing += 1
+        try:
+            yield ticket
+        finally:
+            if ticket.pending:
+                with self._cond:
+                    self._preparing -= 1
+                    self._cond.notify_all()
+
+    def submit(self, item: Any, ticket: Optional[Ticket] = None) -> Any:
+        request = _Request(item)
+        with self._cond:
+            if ticket is not None and ticket.pending:
+                ticket.pending = False
+                self._preparing -= 1
+            self._queue.append(request)
+            self._cond.notify_all()
+            while not request.done and self._leading:
+                self._cond.wait()
+            if not request.done:
+                self._leading = True
+
+        if not request.done:
+            try:
+                while not request.done:
+                    self._run_next()
+            finally:
+                with self._cond:
+                    self._leading = False
+                    self._cond.notify_all()
+
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _run_next(self) -> None:
+        with self._cond:
+            deadline = time.monotonic() + self.max_wait
+            while len(self._queue) < self.max_batch_size and self._preparing > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._queue[:self.max_batch_size]
+            del self._queue[:self.max_batch_size]
+
+        try:
+            results = self.run_batch([request.item for request in batch])
+            for request, result in zip(batch, results):
+                request.result = result
+        except Exception as e:
+            logger.error(f"Batched run of {len(batch)} items failed: {e}")
+            for request in batch:
+                request.error = e
+
+        with self._cond:
+            for request in batch:
+                request.done = True
+            self.batches += 1
+            self.items += len(batch)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            }
@@ -4,28 +4,49 @@ import sys
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, current_dir)
 
-from ancient_arch_extractor import AncientArchExtractor
+from ancient_arch_extractor import FEATURE_KEYS, ROYAL_RATIO_KEYS, AncientArchExtractor, UnreadableImageError, resolve_feature_keys
+from feature_cache import FeatureCache
+from image_io import ImageBuffer
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
 import joblib
 import logging
-from resnet_hybrid_pipeline import HybridClassifier, HybridFeatureExtractor, ResNet18FeatureExtractor
+import numpy as np
+from stage_metrics import STAGE_METRICS
+
+# resnet_hybrid_pipeline (sklearn, and torch once a backbone is built) and
+# pandas are imported on first use, so MLP-only servers never load them up
+# front.
+if TYPE_CHECKING:
+    from resnet_hybrid_pipeline import ResNet18FeatureExtractor
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Features behind royal_ratio / entropy_score / edge_density / texture_complexity.
+SUMMARY_KEYS = ROYAL_RATIO_KEYS + ["entropy", "edge_density", "contrast"]
+
 
 class MLPInference:
-    def __init__(self):
-        self.extractor = AncientArchExtractor()
+    def __init__(self, feature_cache: Optional[FeatureCache] = None, extractor: Optional[AncientArchExtractor] = None):
+        self.extractor = extractor or AncientArchExtractor(feature_cache=feature_cache)
         self.model = None
         self.scaler = None
         self.model_path = os.path.join(current_dir, "models", "mlp_model.pkl")
         self.scaler_path = os.path.join(current_dir, "models", "scaler.pkl")
+        self.feature_keys: List[str] = list(FEATURE_KEYS)
+
+    def model_files(self) -> List[str]:
+        return [self.model_path, self.scaler_path]
 
     def load_model(self):
         try:
             if os.path.exists(self.model_path) and os.path.exists(self.scaler_path):
                 self.model = joblib.load(self.model_path)
                 self.scaler = joblib.load(self.scaler_path)
+                # Models trained on a feature subset declare it through the
+                # scaler; older models were fit on all 19 features, unnamed.
+                declared = getattr(self.scaler, "feature_names_in_", None)
+                self.feature_keys = resolve_feature_keys(declared) if declared is not None else list(FEATURE_KEYS)
                 logger.info(f"Model loaded from: {self.model_path}")
                 logger.info(f"Scaler loaded from: {self.scaler_path}")
                 return True
@@ -35,7 +56,35 @@ class MLPInference:
             logger.error(f"Failed to load model: {e}")
             return False
 
-    def predict(self, image_path: str):
+    def required_features(self, summary: bool = True) -> List[str]:
+        keys = list(self.feature_keys)
+        if summary:
+            keys += [key for key in SUMMARY_KEYS if key not in keys]
+        return keys
+
+    def predict(self, image_path: str, summary: bool = True):
+        """
+        ``summary=False`` leaves out royal_ratio and the other descriptive
+        fields, so only the features the model uses are extracted.
+        """
+        logger.debug(f"Processing image: {image_path}")
+        return self._predict(lambda features: self.extractor.extract_features(image_path, features), summary)
+
+    def predict_from_bytes(self, data: ImageBuffer, summary: bool = True):
+        """Raises ``UnreadableImageError`` if ``data`` is not a decodable image."""
+        return self._predict(lambda features: self.extractor.extract_features_from_bytes(data, features, strict=True), summary)
+
+    def predict_from_array(self, image: np.ndarray, summary: bool = True):
+        return self._predict(lambda features: self.extractor.extract_features_from_array(image, features), summary)
+
+    def predict_features(self, feature_dict: Dict[str, float], summary: bool = True):
+        """Predict from features the caller already extracted (must cover ``required_features``)."""
+        def extract(features: List[str]) -> Tuple[Dict[str, float], np.ndarray]:
+            selected = {key: feature_dict[key] for key in features}
+            return selected, np.array(list(selected.values()), dtype=np.float32)
+        return self._predict(extract, summary)
+
+    def _predict(self, extract: Callable[[List[str]], Tuple[Dict[str, float], np.ndarray]], summary: bool = True):
         try:
             if self.model is None or self.scaler is None:
                 logger.error("Model not loaded!")
@@ -50,8 +99,7 @@ class MLPInference:
                     "texture_complexity": 0.0,
                 }
 
-            logger.info(f"Processing image: {image_path}")
-            feature_dict, feature_vector = self.extractor.extract_features(image_path)
+            feature_dict, feature_vector = extract(self.required_features(summary))
 
             if len(feature_vector) == 0:
                 logger.error("Failed to extract features!")
@@ -66,31 +114,38 @@ class MLPInference:
                     "texture_complexity": 0.0,
                 }
 
-            feature_vector_scaled = self.scaler.transform(feature_vector.reshape(1, -1))
-            prediction = self.model.predict(feature_vector_scaled)[0]
-            prediction_proba = self.model.predict_proba(feature_vector_scaled)[0]
+            model_input = np.array([[feature_dict[key] for key in self.feature_keys]], dtype=np.float32)
+            if hasattr(self.scaler, "feature_names_in_"):
+                import pandas as pd
+
+                model_input = pd.DataFrame(model_input, columns=self.feature_keys)
+            with STAGE_METRICS.timer("classifier"):
+                feature_vector_scaled = self.scaler.transform(model_input)
+                prediction = self.model.predict(feature_vector_scaled)[0]
+                prediction_proba = self.model.predict_proba(feature_vector_scaled)[0]
 
             prediction_label = "royal" if prediction == 1 else "civilian"
             confidence = float(prediction_proba[prediction])
 
-            royal_ratio = feature_dict.get("ratio_yellow", 0) + feature_dict.get("ratio_red_1", 0) + feature_dict.get("ratio_red_2", 0)
-            entropy_score = feature_dict.get("entropy", 0)
-            edge_density = feature_dict.get("edge_density", 0)
-            texture_complexity = feature_dict.get("contrast", 0)
-
             result = {
                 "success": True,
                 "message": "Prediction completed",
                 "prediction": prediction_label,
                 "confidence": round(confidence, 4),
-                "royal_ratio": round(royal_ratio, 4),
-                "entropy_score": round(entropy_score, 4),
-                "edge_density": round(edge_density, 4),
-                "texture_complexity": round(texture_complexity, 4),
             }
+            if summary:
+                royal_ratio = feature_dict.get("ratio_yellow", 0) + feature_dict.get("ratio_red_1", 0) + feature_dict.get("ratio_red_2", 0)
+                result.update({
+                    "royal_ratio": round(royal_ratio, 4),
+                    "entropy_score": round(feature_dict.get("entropy", 0), 4),
+                    "edge_density": round(feature_dict.get("edge_density", 0), 4),
+                    "texture_complexity": round(feature_dict.get("contrast", 0), 4),
+                })
 
-            logger.info(f"Prediction: {prediction_label} (confidence: {confidence:.4f})")
+            logger.debug(f"Prediction: {prediction_label} (confidence: {confidence:.4f})")
             return result
+        except UnreadableImageError:
+            raise
         except Exception as e:
             logger.error(f"Prediction failed: {e}")
             return {
@@ -106,42 +161,113 @@ class MLPInference:
 
 
 class HybridInference:
-    def __init__(self, device: str = "cpu"):
+    def __init__(
+        self,
+        device: str = "cpu",
+        feature_cache: Optional[FeatureCache] = None,
+        resnet_provider: Optional[Callable[[], "ResNet18FeatureExtractor"]] = None,
+        handcrafted_extractor: Optional[AncientArchExtractor] = None,
+    ):
+        """
+        ``resnet_provider`` returns a (shared) backbone for ``device`` and is
+        only called once a bundle has loaded; by default each instance builds
+        its own.
+        """
         self.device = device
+        self.feature_cache = feature_cache
+        self.resnet_provider = resnet_provider
+        self.handcrafted_extractor = handcrafted_extractor
         self.extractor = None
         self.model = None
         self.model_path = os.path.join(current_dir, "models", "resnet_hybrid_bundle.pkl")
 
+    def model_files(self) -> List[str]:
+        return [self.model_path]
+
     def load_model(self):
         try:
+            from resnet_hybrid_pipeline import HybridClassifier, HybridFeatureExtractor, ResNet18FeatureExtractor
+
             if not os.path.exists(self.model_path):
                 logger.error("Hybrid model bundle not found!")
                 return False
             self.model = HybridClassifier.load(self.model_path)
+            resnet_extractor = self.resnet_provider() if self.resnet_provider is not None else None
             if self.model.feature_layout == "fused":
-                self.extractor = HybridFeatureExtractor(device=self.device)
+                self.extractor = HybridFeatureExtractor(
+                    device=self.device,
+                    feature_cache=self.feature_cache,
+                    resnet_extractor=resnet_extractor,
+                    handcrafted_extractor=self.handcrafted_extractor,
+                )
             else:
-                self.extractor = ResNet18FeatureExtractor(device=self.device)
+                self.extractor = resnet_extractor or ResNet18FeatureExtractor(device=self.device, feature_cache=self.feature_cache)
             logger.info(f"Hybrid model loaded from: {self.model_path}")
             return True
         except Exception as e:
             logger.error(f"Failed to load hybrid model: {e}")
             return False
 
-    def predict(self, image_path: str):
+    def _fused(self) -> bool:
+        from resnet_hybrid_pipeline import HybridFeatureExtractor
+
+        return isinstance(self.extractor, HybridFeatureExtractor)
+
+    def predict(self, image_path: str, handcrafted: Optional[np.ndarray] = None):
+        """
+        ``handcrafted`` passes an already extracted 19-d vector through to
+        fused models instead of computing it again.
+        """
+        if handcrafted is not None and self._fused():
+            return self._predict(lambda: self.extractor.extract_features(image_path, augmented=False, handcrafted=handcrafted))
+        return self._predict(lambda: self.extractor.extract_features(image_path, augmented=False))
+
+    def predict_from_bytes(self, data: ImageBuffer, handcrafted: Optional[np.ndarray] = None):
+        if handcrafted is not None and self._fused():
+            return self._predict(lambda: self.extractor.extract_features_from_bytes(data, augmented=False, handcrafted=handcrafted))
+        return self._predict(lambda: self.extractor.extract_features_from_bytes(data, augmented=False))
+
+    def predict_from_array(self, image: np.ndarray):
+        return self._predict(lambda: self.extractor.extract_features_from_array(image, augmented=False))
+
+    def predict_batch(self, image_paths: List[str]) -> List[Dict]:
+        """
+        Predict several images with batched ResNet forward passes instead of
+        one per image; results are in input order.
+        """
+        if self.model is None or self.extractor is None:
+            logger.error("Hybrid model not loaded!")
+            return [self._failed("Hybrid model not loaded") for _ in image_paths]
+        try:
+            vectors = self.extractor.extract_features_batch(image_paths)
+        except Exception as e:
+            logger.error(f"Hybrid batch extraction failed: {e}")
+            return [self._failed(f"Hybrid prediction failed: {str(e)}") for _ in image_paths]
+        return [
+            self._failed("Hybrid prediction failed: cannot extract features")
+            if vector is None else self._predict(lambda vector=vector: vector)
+            for vector in vectors
+        ]
+
+    @staticmethod
+    def _failed(message: str) -> Dict:
+        return {
+            "success": False,
+            "message": message,
+            "prediction": "unknown",
+            "confidence": 0.0,
+            "probabilities": {},
+        }
+
+    def _predict(self, extract: Callable[[], np.ndarray]):
         try:
             if self.model is None or self.extractor is None:
                 logger.error("Hybrid model not loaded!")
-                return {
-                    "success": False,
-                    "message": "Hybrid model not loaded",
-                    "prediction": "unknown",
-                    "confidence": 0.0,
-                    "probabilities": {},
-                }
+                return self._failed("Hybrid model not loaded")
 
-            feature_vector = self.extractor.extract_features(image_path, augmented=False)
-            result = self.model.predict_single(feature_vector)
+            feature_vector = extract()
+            with STAGE_METRICS.timer("classifier"):
+                result = self.model.predict_single(feature_vector)
             return {
                 "success": True,
                 "message": "Hybrid prediction completed",
@@ -154,13 +280,7 @@ class HybridInference:
             }
         except Exception as e:
             logger.error(f"Hybrid prediction failed: {e}")
-            return {
-                "success": False,
-                "message": f"Hybrid prediction failed: {str(e)}",
-                "prediction": "unknown",
-                "confidence": 0.0,
-                "probabilities": {},
-            }
+            return self._failed(f"Hybrid prediction failed: {str(e)}")
 
 
 if __name__ == "__main__":
@@ -174,7 +294,12 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
-    inference = HybridInference(device=args.device) if args.model_type == "hybrid" else MLPInference()
+    feature_cache = FeatureCache.from_env()
+    inference = (
+        HybridInference(device=args.device, feature_cache=feature_cache)
+        if args.model_type == "hybrid"
+        else MLPInference(feature_cache=feature_cache)
+    )
 
     if args.load_model:
         print("=" * 70)
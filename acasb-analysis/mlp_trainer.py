@@ -1,13 +1,15 @@
 import os
 import sys
-from typing import Tuple
+from typing import Optional, Sequence, Tuple
 from pathlib import Path
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, current_dir)
 
-from ancient_arch_extractor import AncientArchExtractor
-from resnet_hybrid_pipeline import HybridClassifier, HybridConfig, HybridFeatureExtractor
+from ancient_arch_extractor import CACHE_NAMESPACE, STATUS_OK, AncientArchExtractor, resolve_feature_keys
+from feature_cache import FeatureCache
+from resnet_hybrid_pipeline import HYBRID_STORE_NAMESPACE, HybridClassifier, HybridConfig, HybridFeatureExtractor
+from training_store import TrainingFeatureStore
 import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
@@ -26,20 +28,27 @@ DEFAULT_DATASET_DIR = str((Path(current_dir).parent / "datasets").resolve())
 DEFAULT_MODEL_DIR = str((Path(current_dir) / "models").resolve())
 
 class MLPTrainer:
-    def __init__(self):
-        self.extractor = AncientArchExtractor()
-        self.feature_keys = [
-            "ratio_yellow", "ratio_red_1", "ratio_red_2", "ratio_blue", "ratio_green",
-            "ratio_gray_white", "ratio_black",
-            "h_mean", "h_std", "s_mean", "s_std", "v_mean", "v_std",
-            "edge_density", "entropy", "contrast", "dissimilarity", "homogeneity", "asm"
-        ]
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        feature_cache: Optional[FeatureCache] = None,
+        feature_keys: Optional[Sequence[str]] = None,
+        store: Optional[TrainingFeatureStore] = None
+    ):
+        self.extractor = AncientArchExtractor(feature_cache=feature_cache)
+        self.workers = workers
+        # Reuses features of unchanged images from earlier runs.
+        self.store = store
+        # A subset is recorded on the saved scaler (feature_names_in_), so
+        # inference only extracts what the model uses.
+        self.feature_keys = resolve_feature_keys(feature_keys)
     
     def scan_dataset(self, base_dir: str) -> pd.DataFrame:
         try:
             logger.info(f"Scanning dataset in: {base_dir}")
             
-            data = []
+            image_paths = []
+            categories = []
             
             for category in ["royal", "civilian"]:
                 category_dir = os.path.join(base_dir, category, "dataset_fixed")
@@ -50,26 +59,19 @@ class MLPTrainer:
                 
                 for filename in os.listdir(category_dir):
                     if filename.endswith(('.jpg', '.jpeg', '.png')):
-                        image_path = os.path.join(category_dir, filename)
-                        
-                        try:
-                            feature_dict, feature_vector = self.extractor.extract_features(image_path)
-                            
-                            label = 1 if category == "royal" else 0
-                            
-                            data.append({
-                                'image_path': image_path,
-                                'category': category,
-                                'label': label,
-                                **feature_dict
-                            })
-                            
-                            logger.info(f"Processed: {filename}")
-                            
-                        except Exception as e:
-                            logger.error(f"Failed to process {filename}: {e}")
-            
-            df = pd.DataFrame(data)
+                        image_paths.append(os.path.join(category_dir, filename))
+                        categories.append(category)
+            
+            feature_matrix, ok = self.extract_features(image_paths)
+            
+            for image_path, row_ok in zip(image_paths, ok):
+                if not row_ok:
+                    logger.error(f"Failed to process {os.path.basename(image_path)}")
+            
+            df = pd.DataFrame(feature_matrix[ok], columns=self.feature_keys)
+            df.insert(0, 'image_path', np.asarray(image_paths, dtype=object)[ok])
+            df.insert(1, 'category', np.asarray(categories, dtype=object)[ok])
+            df.insert(2, 'label', (df['category'] == "royal").astype(int))
             
             logger.info(f"Total samples: {len(df)}")
             logger.info(f"Royal samples: {len(df[df['label'] == 1])}")
@@ -81,9 +83,28 @@ class MLPTrainer:
             logger.error(f"Failed to scan dataset: {e}")
             return pd.DataFrame()
     
+    def extract_features(self, image_paths: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Feature matrix for ``image_paths`` and a mask of the rows that succeeded."""
+        def extract(chunk, chunk_progress=None):
+            matrix, status = self.extractor.extract_features_batch(
+                chunk, workers=self.workers, features=self.feature_keys, progress=chunk_progress
+            )
+            return [row if row_status == STATUS_OK else None for row, row_status in zip(matrix, status)]
+
+        if self.store is None:
+            rows = extract(list(image_paths))
+        else:
+            version = f"{self.extractor.cache_version}/keys={','.join(self.feature_keys)}"
+            rows, _ = self.store.load_or_extract(CACHE_NAMESPACE, version, image_paths, extract)
+        feature_matrix = np.zeros((len(rows), len(self.feature_keys)), dtype=np.float32)
+        for index, row in enumerate(rows):
+            if row is not None:
+                feature_matrix[index] = np.ravel(row)
+        return feature_matrix, np.array([row is not None for row in rows], dtype=bool)
+
     def prepare_training_data(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, StandardScaler]:
         try:
-            X = df[self.feature_keys].values
+            X = df[self.feature_keys]
             y = df['label'].values
             
             scaler = StandardScaler()
@@ -201,9 +222,23 @@ class MLPTrainer:
 
 
 class HybridTrainer:
-    def __init__(self, device: str = "cpu"):
+    def __init__(
+        self,
+        device: str = "cpu",
+        feature_cache: Optional[FeatureCache] = None,
+        store: Optional[TrainingFeatureStore] = None,
+        batch_size: int = 32,
+        workers: Optional[int] = None,
+        cv_jobs: int = -1
+    ):
         self.device = device
-        self.extractor = HybridFeatureExtractor(device=device)
+        self.extractor = HybridFeatureExtractor(device=device, feature_cache=feature_cache)
+        self.store = store
+        # Backbone batch size and background image decoding processes.
+        self.batch_size = batch_size
+        self.workers = workers if workers is not None else max(0, min(4, (os.cpu_count() or 1) - 1))
+        # Cross-validation folds fit in parallel (joblib n_jobs, -1: all cores).
+        self.cv_jobs = cv_jobs
 
     def _infer_label(self, image_path: Path, base_dir: Path) -> str:
         parent = image_path.parent
@@ -224,17 +259,23 @@ class HybridTrainer:
         return samples
 
     def build_feature_matrix(self, samples: list[tuple[Path, str]], augment_factor: int) -> tuple[np.ndarray, np.ndarray]:
-        features: list[np.ndarray] = []
-        labels: list[str] = []
+        views = 1 + max(augment_factor, 0)
+        paths = [str(image_path) for image_path, _ in samples]
 
-        for image_path, label in samples:
-            features.append(self.extractor.extract_features(image_path, augmented=False))
-            labels.append(label)
-            for _ in range(max(augment_factor, 0)):
-                features.append(self.extractor.extract_features(image_path, augmented=True))
-                labels.append(label)
+        def extract(chunk, chunk_progress=None):
+            return self.extractor.extract_views_batch(
+                chunk, augment_factor, batch_size=self.batch_size, workers=self.workers, progress=chunk_progress
+            )
 
-        return np.vstack(features), np.array(labels)
+        if self.store is None:
+            rows = extract(paths)
+        else:
+            rows, _ = self.store.load_or_extract(
+                HYBRID_STORE_NAMESPACE, self.extractor.cache_version, paths, extract, views=views
+            )
+        kept = [index for index, row in enumerate(rows) if row is not None]
+        labels = np.array([samples[index][1] for index in kept])
+        return np.vstack([rows[index] for index in kept]), np.repeat(labels, views)
 
     def run(
         self,
@@ -269,7 +310,7 @@ class HybridTrainer:
                 svm_c=svm_c,
             )
             classifier = HybridClassifier(config=config)
-            cv_result = classifier.cross_validate(X, y, n_splits=5)
+            cv_result = classifier.cross_validate(X, y, n_splits=5, n_jobs=self.cv_jobs)
             logger.info("Cross validation mean=%s std=%s folds=%s",
                         cv_result["mean_accuracy"], cv_result["std_accuracy"], cv_result["fold_scores"])
 
@@ -318,11 +359,22 @@ if __name__ == "__main__":
     parser.add_argument("--svm-kernel", default="rbf", choices=["linear", "rbf", "poly", "sigmoid"])
     parser.add_argument("--svm-c", type=float, default=1.0)
     parser.add_argument("--device", default="cpu")
+    parser.add_argument("--workers", type=int, default=None, help="Feature extraction processes (default: all cores; hybrid: image decoding workers, up to 4)")
+    parser.add_argument("--batch-size", type=int, default=32, help="Hybrid: views (base + augmented) per ResNet forward pass")
+    parser.add_argument("--cv-jobs", type=int, default=-1, help="Hybrid: cross-validation folds fit in parallel (default: -1, all cores)")
+    parser.add_argument("--features", default=None, help="Comma-separated subset of handcrafted features for the MLP (default: all 19)")
     args = parser.parse_args()
 
     try:
         if args.model_type == "hybrid":
-            trainer = HybridTrainer(device=args.device)
+            trainer = HybridTrainer(
+                device=args.device,
+                feature_cache=FeatureCache.from_env(),
+                store=TrainingFeatureStore.from_env(),
+                batch_size=args.batch_size,
+                workers=args.workers,
+                cv_jobs=args.cv_jobs
+            )
             pca_components = float(args.pca_components) if "." in args.pca_components else int(args.pca_components)
             success = trainer.run(
                 args.base_dir,
@@ -333,7 +385,13 @@ if __name__ == "__main__":
                 svm_c=args.svm_c,
             )
         else:
-            trainer = MLPTrainer()
+            feature_keys = [name.strip() for name in args.features.split(",") if name.strip()] if args.features else None
+            trainer = MLPTrainer(
+                workers=args.workers,
+                feature_cache=FeatureCache.from_env(),
+                feature_keys=feature_keys,
+                store=TrainingFeatureStore.from_env()
+            )
             success = trainer.run(args.base_dir, args.save_dir)
         
         if not success:
@@ -0,0 +1,264 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from stage_metrics import StageMetrics
+
+logger = logging.getLogger(__name__)
+
+ModelKey = Tuple[str, str, str]
+# (size, mtime_ns) per model file; None for a file that does not exist.
+Fingerprint = Tuple[Optional[Tuple[int, int]], ...]
+
+DEFAULT_SETTLE_SECONDS = 1.0
+DEFAULT_POOL_SIZE = 8
+DEFAULT_POOL_MB = 2048
+
+
+def file_fingerprint(paths: List[str]) -> Fingerprint:
+    stats = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stats.append((stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            stats.append(None)
+    return tuple(stats)
+
+
+def content_digest(paths: List[str]) -> str:
+    hasher = hashlib.blake2b(digest_size=20)
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _float_env(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)).strip() or default)
+    except ValueError:
+        return default
+
+
+@dataclass
+class _Entry:
+    model: Any
+    files: List[str]
+    fingerprint: Fingerprint
+    digest: str
+    # Serialized size of the model files, used as the memory estimate.
+    size: int
+    # Fingerprint a background reload already tried and failed on, so a
+    # broken file is not reloaded on every request.
+    failed_fingerprint: Optional[Fingerprint] = None
+    reloading: bool = False
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class ModelRegistry:
+    """
+    Bounded pool of loaded inference objects keyed by
+    ``(model_type, model_path, device)``.
+
+    ``factory`` builds an unloaded object exposing ``model_files()`` and
+    ``load_model() -> bool`` (``MLPInference`` / ``HybridInference``). Each
+    key is loaded once. Every ``get`` stats the model files; when size or
+    mtime change and the content hash differs, a fresh object is loaded in
+    a background thread and swapped in once ready. Callers keep receiving
+    (and in-flight requests keep using) the old object until then.
+
+    A reload waits until the files have stopped changing for
+    ``settle_seconds``, so a model whose files are still being written (MLP
+    model and scaler are two files) is not picked up half way.
+
+    At most ``max_models`` models are kept, and their estimated size (the
+    model files on disk; extractors and the ResNet backbone are shared by the
+    factory and not counted) stays under ``max_bytes``. The least recently
+    used models are evicted first; requests already holding one finish with
+    it. ``max_bytes=0`` disables the size limit.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str, Optional[str], str], Any],
+        settle_seconds: float = DEFAULT_SETTLE_SECONDS,
+        max_models: int = DEFAULT_POOL_SIZE,
+        max_bytes: int = DEFAULT_POOL_MB * 1024 * 1024,
+    ):
+        self.factory = factory
+        self.settle_seconds = settle_seconds
+        self.max_models = max(1, max_models)
+        self.max_bytes = max(0, max_bytes)
+        self._entries: "OrderedDict[ModelKey, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[ModelKey, threading.Lock] = {}
+        # Load durations per model_type, plus event counts for /metrics
+        # (updated under self._lock, read with event_counts()).
+        self.load_metrics = StageMetrics()
+        self.events: Dict[str, int] = {"load_failed": 0, "reload": 0, "reload_failed": 0, "eviction": 0}
+
+    @classmethod
+    def from_env(cls, factory: Callable[[str, Optional[str], str], Any]) -> "ModelRegistry":
+        """
+        Build the registry from ``ACASB_MODEL_SETTLE_SECONDS``,
+        ``ACASB_MODEL_POOL_SIZE`` and ``ACASB_MODEL_POOL_MB``.
+        """
+        return cls(
+            factory,
+            settle_seconds=max(0.0, _float_env("ACASB_MODEL_SETTLE_SECONDS", DEFAULT_SETTLE_SECONDS)),
+            max_models=int(_float_env("ACASB_MODEL_POOL_SIZE", DEFAULT_POOL_SIZE)),
+            max_bytes=int(_float_env("ACASB_MODEL_POOL_MB", DEFAULT_POOL_MB) * 1024 * 1024),
+        )
+
+    def get(self, model_type: str, model_path: Optional[str], device: str) -> Optional[Any]:
+        """Return the loaded model for this key, or None if it cannot be loaded."""
+        key = (model_type, model_path or "", device)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            return self._load_first(key, model_type, model_path, device)
+        self._check(key, entry)
+        return entry.model
+
+    def event_counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.events)
+
+    def _count(self, event: str) -> None:
+        # Request threads and reload threads both count; _evict runs with
+        # the lock already held and counts directly.
+        with self._lock:
+            self.events[event] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "models": len(self._entries),
+                "bytes": sum(entry.size for entry in self._entries.values()),
+            }
+
+    def _load_first(self, key: ModelKey, model_type: str, model_path: Optional[str], device: str) -> Optional[Any]:
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # Concurrent first requests for one key load it once.
+        with key_lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry.model
+            loaded = self._load(model_type, model_path, device)
+            if loaded is None:
+                return None
+            with self._lock:
+                self._entries[key] = loaded
+                self._evict(keep=key)
+            return loaded.model
+
+    def _evict(self, keep: ModelKey) -> None:
+        # Caller holds self._lock.
+        total = sum(entry.size for entry in self._entries.values())
+        while len(self._entries) > 1:
+            if len(self._entries) <= self.max_models and (not self.max_bytes or total <= self.max_bytes):
+                break
+            key = next(iter(self._entries))
+            if key == keep:
+                self._entries.move_to_end(key)
+                key = next(iter(self._entries))
+            entry = self._entries.pop(key)
+            total -= entry.size
+            self.events["eviction"] += 1
+            logger.info(f"Evicted {key[0]} model {entry.files[0]} ({key[2]}) from the model pool")
+
+    def _load(self, model_type: str, model_path: Optional[str], device: str) -> Optional[_Entry]:
+        model = self.factory(model_type, model_path, device)
+        files = list(model.model_files())
+        fingerprint = file_fingerprint(files)
+        with self.load_metrics.timer(model_type):
+            loaded = model.load_model()
+        if not loaded:
+            self._count("load_failed")
+            return None
+        try:
+            digest = content_digest(files)
+        except OSError as e:
+            logger.warning(f"Cannot hash model files {files}: {e}")
+            digest = ""
+        size = sum(stat[0] for stat in fingerprint if stat is not None)
+        logger.info(f"Registered {model_type} model for {files[0]} on {device}")
+        return _Entry(model=model, files=files, fingerprint=fingerprint, digest=digest, size=size)
+
+    def _check(self, key: ModelKey, entry: _Entry) -> None:
+        fingerprint = file_fingerprint(entry.files)
+        if fingerprint == entry.fingerprint or fingerprint == entry.failed_fingerprint:
+            return
+        with entry.lock:
+            if entry.reloading:
+                return
+            entry.reloading = True
+        threading.Thread(
+            target=self._reload,
+            args=(key, entry),
+            name=f"acasb-model-reload-{key[0]}",
+            daemon=True
+        ).start()
+
+    def _reload(self, key: ModelKey, entry: _Entry) -> None:
+        try:
+            fingerprint = self._settled_fingerprint(entry.files)
+            if None in fingerprint:
+                logger.warning(f"Model files missing, keeping the loaded model: {entry.files}")
+                entry.failed_fingerprint = fingerprint
+                return
+
+            digest = content_digest(entry.files)
+            if digest == entry.digest:
+                # Touched or copied over with identical content.
+                entry.fingerprint = fingerprint
+                return
+
+            model_type, model_path, device = key
+            loaded = self._load(model_type, model_path or None, device)
+            if loaded is None or loaded.fingerprint != fingerprint:
+                logger.error(f"Reloading {model_type} model failed, keeping the previous one: {entry.files}")
+                self._count("reload_failed")
+                entry.failed_fingerprint = fingerprint
+                return
+
+            with self._lock:
+                if self._entries.get(key) is not entry:
+                    # Evicted while reloading; the next get() loads afresh.
+                    return
+                # Readers switch to the new object on their next get();
+                # requests holding the old one finish with it.
+                self._entries[key] = loaded
+                self.events["reload"] += 1
+                self._evict(keep=key)
+            logger.info(f"Swapped in retrained {model_type} model: {entry.files[0]}")
+        except Exception as e:
+            logger.error(f"Model reload failed: {e}")
+            entry.failed_fingerprint = file_fingerprint(entry.files)
+        finally:
+            with entry.lock:
+                entry.reloading = False
+
+    def _settled_fingerprint(self, files: List[str]) -> Fingerprint:
+        fingerprint = file_fingerprint(files)
+        while self.settle_seconds > 0:
+            time.sleep(self.settle_seconds)
+            current = file_fingerprint(files)
+            if current == fingerprint:
+                break
+            fingerprint = current
+        return fingerprint
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,119 @@
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Any, Callable, Dict, Optional
+
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+# A worker that dies sooner than this after starting is respawned only
+# after a pause, so a crash at startup does not turn into a fork loop.
+MIN_WORKER_UPTIME = 5.0
+RESPAWN_DELAY = 1.0
+
+
+def fork_supported() -> bool:
+    return hasattr(os, "fork")
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def serve_prefork(
+    app: Any,
+    host: str,
+    port: int,
+    workers: int,
+    preload: Optional[Callable[[], None]] = None,
+    on_worker_start: Optional[Callable[[int], None]] = None,
+    log_level: str = "info",
+) -> None:
+    """
+    Run ``app`` in ``workers`` forked uvicorn processes sharing one socket.
+
+    ``preload`` runs once in the parent before forking, so models and the
+    ResNet backbone it loads are shared copy-on-write by every worker. The
+    parent's heap is frozen out of the garbage collector first; otherwise a
+    GC pass in a worker would write to every object header and un-share the
+    pages. ``on_worker_start(index)`` runs in each worker after the fork.
+
+    The parent only supervises: it respawns workers that exit and forwards
+    SIGINT/SIGTERM to them on shutdown. Requires ``os.fork`` (POSIX).
+    """
+    if preload is not None:
+        started = time.perf_counter()
+        preload()
+        logger.info(f"Preloaded models in {time.perf_counter() - started:.2f}s")
+
+    sock = _bind(host, port)
+    gc.collect()
+    gc.freeze()
+
+    children: Dict[int, tuple] = {}
+    stopping = False
+
+    def spawn(index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                if on_worker_start is not None:
+                    on_worker_start(index)
+                logger.info(f"Worker {index} serving on {host}:{port} (pid {os.getpid()})")
+                config = uvicorn.Config(app, host=host, port=port, log_level=log_level)
+                uvicorn.Server(config).run(sockets=[sock])
+            except BaseException as e:
+                logger.error(f"Worker {index} failed: {e}")
+                status = 1
+            finally:
+                os._exit(status)
+        children[pid] = (index, time.monotonic())
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    logger.info(f"Starting {workers} workers on {host}:{port}")
+    for index in range(workers):
+        spawn(index)
+
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            if pid not in children:
+                continue
+            index, started = children.pop(pid)
+            if stopping:
+                continue
+            logger.warning(f"Worker {index} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+            if time.monotonic() - started < MIN_WORKER_UPTIME:
+                time.sleep(RESPAWN_DELAY)
+            if not stopping:
+                spawn(index)
+    finally:
+        sock.close()
+        logger.info("All workers stopped")
@@ -1,18 +1,27 @@
 from __future__ import annotations
 
 import logging
+from contextlib import nullcontext
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Iterable
+from typing import Any, Callable, Iterable, Sequence
 
+import os
+
+import cv2
 import joblib
 import numpy as np
-from ancient_arch_extractor import AncientArchExtractor
+from ancient_arch_extractor import STATUS_OK, AncientArchExtractor
+from feature_cache import FeatureCache
+from image_io import BufferReader, ImageBuffer, load_bgr_image
+from micro_batch import MicroBatcher, Ticket
+from stage_metrics import STAGE_METRICS
 from sklearn.decomposition import PCA
 from sklearn.model_selection import StratifiedKFold
 from sklearn.neural_network import MLPClassifier
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.svm import SVC
+from threadpoolctl import threadpool_limits
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +29,9 @@ IMAGENET_MEAN = [0.485, 0.456, 0.406]
 IMAGENET_STD = [0.229, 0.224, 0.225]
 RESNET_FEATURE_DIM = 512
 HANDCRAFTED_FEATURE_DIM = 19
+RESNET_CACHE_NAMESPACE = "resnet18"
+# Training feature store rows (base + augmented fused vectors per image).
+HYBRID_STORE_NAMESPACE = "hybrid"
 
 
 def _load_torch_stack():
@@ -36,13 +48,63 @@ def _load_torch_stack():
     return torch, nn, Image, models, transforms
 
 
+class _TrainingViews:
+    """
+    Map-style dataset of image paths for a torch ``DataLoader``: decoding
+    and transforms run in the loader's workers. Each image is decoded once
+    and yields its base view plus ``augment_factor`` augmented views of the
+    same in-memory image. ``__getitem__`` returns ``(index, tensor)`` with a
+    ``(1 + augment_factor, 3, H, W)`` tensor, or ``None`` for images that
+    cannot be read so one bad file does not stop the run.
+    """
+
+    def __init__(self, image_paths: Sequence[str], augment_factor: int, base_transform, augment_transform, draft_side: int | None):
+        self.image_paths = list(image_paths)
+        self.augment_factor = max(augment_factor, 0)
+        self.base_transform = base_transform
+        self.augment_transform = augment_transform
+        self.draft_side = draft_side
+
+    def __len__(self) -> int:
+        return len(self.image_paths)
+
+    def __getitem__(self, index: int):
+        import torch
+        from PIL import Image
+
+        image_path = self.image_paths[index]
+        try:
+            with Image.open(image_path) as image:
+                if self.draft_side is not None:
+                    image.draft("RGB", (self.draft_side, self.draft_side))
+                image = image.convert("RGB")
+            views = [self.base_transform(image)]
+            views.extend(self.augment_transform(image) for _ in range(self.augment_factor))
+            return index, torch.stack(views)
+        except Exception as e:
+            logger.error(f"Failed to load {image_path}: {e}")
+            return index, None
+
+
 class ResNet18FeatureExtractor:
     """
     Deep feature extractor based on the local hybrid workflow:
     pretrained ResNet18 -> frozen backbone -> remove FC -> 512-d vector.
     """
 
-    def __init__(self, device: str = "cpu", image_size: int = 224):
+    def __init__(
+        self,
+        device: str = "cpu",
+        image_size: int = 224,
+        fast_decode: bool = False,
+        feature_cache: FeatureCache | None = None,
+        max_batch_size: int = 1,
+        max_wait_ms: float = 5.0,
+    ):
+        """
+        ``max_batch_size > 1`` coalesces concurrent non-augmented calls from
+        different threads into one forward pass (see ``MicroBatcher``).
+        """
         torch, nn, image_cls, models, transforms = _load_torch_stack()
         self._torch = torch
         self._nn = nn
@@ -51,9 +113,19 @@ class ResNet18FeatureExtractor:
         self._transforms = transforms
         self.device = torch.device(device)
         self.image_size = image_size
+        self.resize_size = 256
+        # Opt-in: JPEG draft mode lets libjpeg decode large photos at
+        # 1/2..1/8 scale; keep twice the resize target so the antialiased
+        # Resize still does the final downsampling. Embeddings move slightly,
+        # so a model must be trained and served with the same setting.
+        self.fast_decode = fast_decode
+        self.draft_min_side = 2 * self.resize_size
+        # Only deterministic (non-augmented) embeddings are cached.
+        self.feature_cache = feature_cache
         self.model = self._load_model()
         self.base_transform = self._build_base_transform()
         self.augment_transform = self._build_augment_transform()
+        self.batcher = MicroBatcher(self._forward, max_batch_size, max_wait_ms) if max_batch_size > 1 else None
 
     def _load_model(self):
         model = self._models.resnet18(weights=self._models.ResNet18_Weights.DEFAULT)
@@ -66,7 +138,7 @@ class ResNet18FeatureExtractor:
 
     def _build_base_transform(self):
         return self._transforms.Compose([
-            self._transforms.Resize(256),
+            self._transforms.Resize(self.resize_size),
             self._transforms.CenterCrop(self.image_size),
             self._transforms.ToTensor(),
             self._transforms.Normalize(mean=IMAGENET_MEAN, std=IMAGENET_STD),
@@ -87,16 +159,149 @@ class ResNet18FeatureExtractor:
             self._transforms.Normalize(mean=IMAGENET_MEAN, std=IMAGENET_STD),
         ])
 
-    def extract_features(self, image_path: str | Path, augmented: bool = False) -> np.ndarray:
+    def _tensor(self, image, augmented: bool):
         transform = self.augment_transform if augmented else self.base_transform
-        with self._image_cls.open(image_path) as image:
-            image = image.convert("RGB")
-            tensor = transform(image).unsqueeze(0).to(self.device)
+        if self.fast_decode:
+            image.draft("RGB", (self.draft_min_side, self.draft_min_side))
+        return transform(image.convert("RGB"))
+
+    def _embed(self, image, augmented: bool, ticket: Ticket | None = None) -> np.ndarray:
+        tensor = self._tensor(image, augmented)
+
+        if self.batcher is not None and not augmented:
+            return self.batcher.submit(tensor, ticket)
+        return self._forward([tensor])[0]
+
+    def _forward(self, tensors) -> list[np.ndarray]:
+        batch = self._torch.stack(list(tensors)).to(self.device)
+
+        with self._torch.no_grad(), STAGE_METRICS.timer("resnet_forward"):
+            features = self.model(batch)
+
+        return list(features.flatten(1).cpu().numpy().astype(np.float32))
+
+    def embed_views(
+        self,
+        image_paths: Sequence[str | Path],
+        augment_factor: int = 0,
+        batch_size: int = 32,
+        workers: int = 0,
+        progress: Callable[[int], None] | None = None,
+    ) -> list[np.ndarray | None]:
+        """
+        Embed training images with their augmented views. A torch
+        ``DataLoader`` decodes each image once in one of ``workers``
+        background processes (0: in this process) and derives the base view
+        and ``augment_factor`` augmented views from it; the backbone runs on
+        batches of about ``batch_size`` views. Returns a
+        ``(1 + augment_factor, 512)`` array per image, None where the image
+        could not be read; ``progress(images_done)`` follows each batch.
+        """
+        dataset = _TrainingViews(
+            [str(image_path) for image_path in image_paths],
+            augment_factor,
+            self.base_transform,
+            self.augment_transform,
+            self.draft_min_side if self.fast_decode else None,
+        )
+        views = 1 + dataset.augment_factor
+        loader = self._torch.utils.data.DataLoader(
+            dataset,
+            batch_size=max(1, batch_size // views),
+            num_workers=max(0, workers),
+            collate_fn=list,
+            prefetch_factor=2 if workers > 0 else None,
+        )
+        embeddings: list[np.ndarray | None] = [None] * len(dataset)
+        done = 0
+        for batch in loader:
+            loaded = [(index, tensors) for index, tensors in batch if tensors is not None]
+            if loaded:
+                vectors = self._forward([view for _, tensors in loaded for view in tensors])
+                for position, (index, _) in enumerate(loaded):
+                    embeddings[index] = np.vstack(vectors[position * views:(position + 1) * views])
+            done += len(batch)
+            if progress is not None:
+                progress(done)
+        return embeddings
+
+    def _expecting(self, augmented: bool):
+        # Tells the batcher a tensor is on its way while the image decodes.
+        if self.batcher is None or augmented:
+            return nullcontext()
+        return self.batcher.expecting()
+
+    @property
+    def cache_version(self) -> str:
+        weights = self._models.ResNet18_Weights.DEFAULT
+        return f"{weights}/size={self.image_size}/resize={self.resize_size}/draft={int(self.fast_decode)}"
+
+    def _cached(self, content: ImageBuffer | np.ndarray, augmented: bool, compute) -> np.ndarray:
+        if self.feature_cache is None or augmented:
+            return compute()
+        key = self.feature_cache.content_key(content)
+        cached = self.feature_cache.get(RESNET_CACHE_NAMESPACE, key, self.cache_version)
+        if cached is not None and cached.shape == (RESNET_FEATURE_DIM,):
+            return cached
+        features = compute()
+        self.feature_cache.put(RESNET_CACHE_NAMESPACE, key, self.cache_version, features)
+        return features
 
-        with self._torch.no_grad():
-            features = self.model(tensor)
+    def _embed_encoded(self, source, augmented: bool, ticket: Ticket | None = None) -> np.ndarray:
+        with self._image_cls.open(source) as image:
+            return self._embed(image, augmented, ticket)
 
-        return features.squeeze().cpu().numpy().astype(np.float32)
+    def extract_features(self, image_path: str | Path, augmented: bool = False) -> np.ndarray:
+        if self.feature_cache is not None and not augmented:
+            with open(image_path, "rb") as f:
+                return self.extract_features_from_bytes(f.read())
+        with self._expecting(augmented) as ticket:
+            return self._embed_encoded(image_path, augmented, ticket)
+
+    def extract_features_from_bytes(self, data: ImageBuffer, augmented: bool = False) -> np.ndarray:
+        with self._expecting(augmented) as ticket:
+            return self._cached(data, augmented, lambda: self._embed_encoded(BufferReader(data), augmented, ticket))
+
+    def extract_features_batch(self, image_paths: Sequence[str | Path], batch_size: int = 32) -> list[np.ndarray | None]:
+        """
+        Non-augmented embeddings for several images: cached ones are read
+        from the feature cache, the rest go through the backbone in forward
+        passes of up to ``batch_size`` images. Returns None for images that
+        cannot be read.
+        """
+        embeddings: list[np.ndarray | None] = [None] * len(image_paths)
+        pending: list[tuple[int, str | None, Any]] = []
+        for index, image_path in enumerate(image_paths):
+            try:
+                with open(image_path, "rb") as f:
+                    data = f.read()
+                key = self.feature_cache.content_key(data) if self.feature_cache is not None else None
+                if key is not None:
+                    cached = self.feature_cache.get(RESNET_CACHE_NAMESPACE, key, self.cache_version)
+                    if cached is not None and cached.shape == (RESNET_FEATURE_DIM,):
+                        embeddings[index] = cached
+                        continue
+                with self._image_cls.open(BufferReader(data)) as image:
+                    pending.append((index, key, self._tensor(image, augmented=False)))
+            except Exception as e:
+                logger.error(f"Failed to load {image_path}: {e}")
+
+        for start in range(0, len(pending), max(1, batch_size)):
+            chunk = pending[start:start + max(1, batch_size)]
+            vectors = self._forward([tensor for _, _, tensor in chunk])
+            for (index, key, _), features in zip(chunk, vectors):
+                embeddings[index] = features
+                if key is not None:
+                    self.feature_cache.put(RESNET_CACHE_NAMESPACE, key, self.cache_version, features)
+        return embeddings
+
+    def extract_features_from_array(self, image: np.ndarray, augmented: bool = False) -> np.ndarray:
+        """``image`` is a decoded uint8 BGR array, as produced by OpenCV."""
+        with self._expecting(augmented) as ticket:
+            def compute() -> np.ndarray:
+                rgb = cv2.cvtColor(load_bgr_image(image), cv2.COLOR_BGR2RGB)
+                return self._embed(self._image_cls.fromarray(rgb), augmented, ticket)
+            return self._cached(image, augmented, compute)
 
 
 class HybridFeatureExtractor:
@@ -108,28 +313,132 @@ class HybridFeatureExtractor:
     augmented samples only perturb the deep visual branch.
     """
 
-    def __init__(self, device: str = "cpu", image_size: int = 224):
-        self.resnet_extractor = ResNet18FeatureExtractor(device=device, image_size=image_size)
-        self.handcrafted_extractor = AncientArchExtractor()
-        self._handcrafted_cache: dict[str, np.ndarray] = {}
+    def __init__(
+        self,
+        device: str = "cpu",
+        image_size: int = 224,
+        feature_cache: FeatureCache | None = None,
+        resnet_extractor: ResNet18FeatureExtractor | None = None,
+        handcrafted_extractor: AncientArchExtractor | None = None,
+    ):
+        """Pass ``resnet_extractor`` / ``handcrafted_extractor`` to share them between models."""
+        self.resnet_extractor = resnet_extractor or ResNet18FeatureExtractor(
+            device=device,
+            image_size=image_size,
+            feature_cache=feature_cache,
+        )
+        # Repeated images hit the handcrafted extractor's persistent feature
+        # cache; nothing is memoized per instance.
+        self.handcrafted_extractor = handcrafted_extractor or AncientArchExtractor(feature_cache=feature_cache)
 
-    def _cache_key(self, image_path: str | Path) -> str:
-        return str(Path(image_path).resolve())
+    @property
+    def cache_version(self) -> str:
+        return f"resnet={self.resnet_extractor.cache_version}/handcrafted={self.handcrafted_extractor.cache_version}"
 
     def extract_handcrafted_features(self, image_path: str | Path) -> np.ndarray:
-        cache_key = self._cache_key(image_path)
-        cached = self._handcrafted_cache.get(cache_key)
-        if cached is not None:
-            return cached
-
         _, feature_vector = self.handcrafted_extractor.extract_features(str(image_path))
-        handcrafted = feature_vector.astype(np.float32)
-        self._handcrafted_cache[cache_key] = handcrafted
-        return handcrafted
-
-    def extract_features(self, image_path: str | Path, augmented: bool = False) -> np.ndarray:
+        return feature_vector.astype(np.float32)
+
+    def extract_features(
+        self,
+        image_path: str | Path,
+        augmented: bool = False,
+        handcrafted: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """``handcrafted`` reuses a 19-d vector the caller already extracted."""
         resnet_features = self.resnet_extractor.extract_features(image_path, augmented=augmented)
-        handcrafted_features = self.extract_handcrafted_features(image_path)
+        handcrafted_features = self.extract_handcrafted_features(image_path) if handcrafted is None else handcrafted
+        return np.concatenate([resnet_features, handcrafted_features]).astype(np.float32)
+
+    def extract_features_batch(self, image_paths: Sequence[str | Path]) -> list[np.ndarray | None]:
+        """
+        Non-augmented fused vectors for several images, with one batched
+        ResNet pass (``ResNet18FeatureExtractor.extract_features_batch``)
+        instead of one per image. Returns None for images that failed.
+        """
+        paths = [str(image_path) for image_path in image_paths]
+        embeddings = self.resnet_extractor.extract_features_batch(paths)
+        handcrafted, status = self.handcrafted_extractor.extract_features_chunk(paths)
+
+        rows: list[np.ndarray | None] = []
+        for index, image_path in enumerate(paths):
+            if status[index] != STATUS_OK or embeddings[index] is None:
+                logger.error(f"Failed to extract hybrid features for {image_path}")
+                rows.append(None)
+                continue
+            rows.append(np.concatenate([embeddings[index], handcrafted[index]]).astype(np.float32))
+        return rows
+
+    def extract_views_batch(
+        self,
+        image_paths: Sequence[str | Path],
+        augment_factor: int,
+        batch_size: int = 32,
+        workers: int = 0,
+        progress: Callable[[int], None] | None = None,
+    ) -> list[np.ndarray | None]:
+        """
+        Training rows per image: the base view, then ``augment_factor``
+        augmented views, as a ``(1 + augment_factor, dim)`` array. ResNet
+        embeddings go through the batched path (``embed_views``, one decode
+        per image for all views), handcrafted vectors through
+        ``extract_features_batch``. Returns None for images that failed.
+        ``progress(images_done)`` follows both steps: an image counts half
+        once embedded and whole once its handcrafted vector is done too.
+        """
+        paths = [str(image_path) for image_path in image_paths]
+        embedded = 0
+
+        def embed_progress(done: int) -> None:
+            nonlocal embedded
+            embedded = done
+            if progress is not None:
+                progress(done // 2)
+
+        def handcrafted_progress(done: int) -> None:
+            if progress is not None:
+                progress((embedded + done) // 2)
+
+        embeddings = self.resnet_extractor.embed_views(
+            paths,
+            augment_factor,
+            batch_size=batch_size,
+            workers=workers,
+            progress=embed_progress,
+        )
+        handcrafted, status = self.handcrafted_extractor.extract_features_batch(
+            paths, workers=max(1, workers), progress=handcrafted_progress
+        )
+
+        rows: list[np.ndarray | None] = []
+        for index, image_path in enumerate(paths):
+            if status[index] != STATUS_OK or embeddings[index] is None:
+                logger.error(f"Failed to extract hybrid features for {image_path}")
+                rows.append(None)
+                continue
+            image_embeddings = embeddings[index]
+            rows.append(np.hstack([
+                image_embeddings,
+                np.repeat(handcrafted[index][None, :], len(image_embeddings), axis=0),
+            ]).astype(np.float32))
+        return rows
+
+    def extract_features_from_bytes(
+        self,
+        data: ImageBuffer,
+        augmented: bool = False,
+        handcrafted: np.ndarray | None = None,
+    ) -> np.ndarray:
+        resnet_features = self.resnet_extractor.extract_features_from_bytes(data, augmented=augmented)
+        if handcrafted is None:
+            _, handcrafted_features = self.handcrafted_extractor.extract_features_from_bytes(data)
+        else:
+            handcrafted_features = handcrafted
+        return np.concatenate([resnet_features, handcrafted_features]).astype(np.float32)
+
+    def extract_features_from_array(self, image: np.ndarray, augmented: bool = False) -> np.ndarray:
+        resnet_features = self.resnet_extractor.extract_features_from_array(image, augmented=augmented)
+        _, handcrafted_features = self.handcrafted_extractor.extract_features_from_array(image)
         return np.concatenate([resnet_features, handcrafted_features]).astype(np.float32)
 
 
@@ -294,20 +603,51 @@ class HybridClassifier:
             },
         }
 
-    def cross_validate(self, X: np.ndarray, y: Iterable[str], n_splits: int = 5) -> dict[str, Any]:
+    def cross_validate(
+        self,
+        X: np.ndarray,
+        y: Iterable[str],
+        n_splits: int = 5,
+        on_fold: Callable[[int, int], None] | None = None,
+        n_jobs: int = 1,
+        threads_per_fold: int | None = None,
+    ) -> dict[str, Any]:
+        """
+        ``n_jobs`` folds are fit at once in separate processes (joblib
+        semantics, ``-1``: one per core), each with BLAS/OpenMP capped at
+        ``threads_per_fold`` threads (default: the cores split between the
+        folds). ``on_fold(fold, n_splits)`` reports the first unfinished
+        fold (1-based): before each fold when run serially.
+        """
         labels = list(y)
         encoded = self.label_encoder.fit_transform(labels)
         skf = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=self.config.random_state)
+        n_jobs = min(n_splits, joblib.effective_n_jobs(n_jobs))
+        if threads_per_fold is None:
+            threads_per_fold = max(1, (os.cpu_count() or 1) // n_jobs)
+
+        folds = [
+            (
+                X[train_idx],
+                [labels[index] for index in train_idx],
+                X[test_idx],
+                [labels[index] for index in test_idx],
+            )
+            for train_idx, test_idx in skf.split(X, encoded)
+        ]
+        if n_jobs > 1:
+            logger.info(f"Cross validating {n_splits} folds in {n_jobs} processes, {threads_per_fold} threads each")
+        results = joblib.Parallel(n_jobs=n_jobs, backend="loky", return_as="generator")(
+            joblib.delayed(_fold_accuracy)(self.config, *fold, threads_per_fold) for fold in folds
+        )
 
         fold_scores: list[float] = []
-        for train_idx, test_idx in skf.split(X, encoded):
-            fold_model = HybridClassifier(config=self.config)
-            y_train = [labels[index] for index in train_idx]
-            y_test = [labels[index] for index in test_idx]
-            fold_model.fit(X[train_idx], y_train)
-            fold_pred = fold_model.predict(X[test_idx])
-            accuracy = float(np.mean(fold_pred == np.array(y_test)))
+        if on_fold is not None:
+            on_fold(1, n_splits)
+        for accuracy in results:
             fold_scores.append(accuracy)
+            if on_fold is not None and len(fold_scores) < n_splits:
+                on_fold(len(fold_scores) + 1, n_splits)
 
         return {
             "fold_scores": [round(score, 4) for score in fold_scores],
@@ -353,3 +693,19 @@ class HybridClassifier:
     def _ensure_fitted(self) -> None:
         if not self._is_fitted:
             raise RuntimeError("HybridClassifier is not fitted")
+
+
+def _fold_accuracy(
+    config: HybridConfig,
+    X_train: np.ndarray,
+    y_train: list[str],
+    X_test: np.ndarray,
+    y_test: list[str],
+    threads: int,
+) -> float:
+    # Module level so joblib can run it in a worker process.
+    with threadpool_limits(threads):
+        fold_model = HybridClassifier(config=config)
+        fold_model.fit(X_train, y_train)
+        fold_pred = fold_model.predict(X_test)
+    return float(np.mean(fold_pred == np.array(y_test)))
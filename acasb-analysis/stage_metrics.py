@@ -0,0 +1,162 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+# Upper bounds in seconds, Prometheus style (cumulative, +Inf implied).
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def snapshot(self) -> Dict:
+        cumulative: List[List] = []
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            running += count
+            cumulative.append([bound, running])
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "buckets": cumulative,
+        }
+
+
+class StageMetrics:
+    """
+    Thread-safe latency histograms keyed by stage name.
+
+    Each process has its own instance; batch workers running in a process
+    pool record into theirs, not the parent's.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = LatencyHistogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str, timings: Optional[Dict[str, float]] = None) -> Iterator[None]:
+        """Time the block into ``stage``; also store the elapsed seconds in ``timings`` if given."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(stage, elapsed)
+            if timings is not None:
+                timings[stage] = timings.get(stage, 0.0) + elapsed
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {stage: histogram.snapshot() for stage, histogram in self._histograms.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def __reduce__(self):
+        # Locks do not pickle. The shared registry maps onto the receiving
+        # process's own STAGE_METRICS; other instances arrive empty.
+        if self is STAGE_METRICS:
+            return _default_metrics, ()
+        return StageMetrics, (self.buckets,)
+
+
+# Process-wide default registry shared by the extractors.
+STAGE_METRICS = StageMetrics()
+
+
+def _default_metrics() -> StageMetrics:
+    return STAGE_METRICS
+
+
+def process_rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None where it cannot be read cheaply."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        import sys
+        # Peak, not current, RSS; bytes on macOS, KiB elsewhere.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+Labels = Mapping[str, str]
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{name}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class PrometheusText:
+    """Builds a Prometheus text exposition (format 0.0.4) page."""
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._lines: List[str] = []
+
+    def _header(self, name: str, kind: str, help_text: str) -> None:
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name: str, kind: str, help_text: str, samples: Iterable[Tuple[Labels, float]]) -> None:
+        """A counter or gauge with one value per label set."""
+        self._header(name, kind, help_text)
+        for labels, value in samples:
+            self._lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    def histograms(self, name: str, help_text: str, snapshots: Iterable[Tuple[Labels, Dict]]) -> None:
+        """Histograms from ``LatencyHistogram.snapshot()`` dicts, one per label set."""
+        self._header(name, "histogram", help_text)
+        for labels, snapshot in snapshots:
+            for bound, count in snapshot["buckets"]:
+                bucket_labels = {**labels, "le": _format_value(float(bound))}
+                self._lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {count}")
+            self._lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(float(snapshot['sum']))}")
+            self._lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
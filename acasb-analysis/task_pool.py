@@ -0,0 +1,86 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+POOL_MODES = ("thread", "process")
+
+
+class TaskPool:
+    """
+    Runs blocking feature extraction / inference / training calls off the
+    asyncio event loop.
+
+    ``thread`` mode shares models and caches with the server process; OpenCV,
+    numpy, sklearn and torch release the GIL for their heavy kernels, so
+    requests still overlap across cores. ``process`` mode gives each worker
+    its own interpreter (spawned, so it is safe after torch has started
+    threads) for fully parallel Python work; task functions and their
+    arguments must then be picklable module-level objects.
+
+    Executors are created on first use, so importing a module that owns a
+    pool inside a worker process does not start a nested pool.
+    """
+
+    def __init__(self, mode: str = "thread", workers: Optional[int] = None, name: str = "acasb"):
+        if mode not in POOL_MODES:
+            raise ValueError(f"Unknown pool mode: {mode} (expected one of {POOL_MODES})")
+        self.mode = mode
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.name = name
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    @classmethod
+    def from_env(cls, name: str = "acasb") -> "TaskPool":
+        """Build the pool from ``ACASB_POOL_MODE`` and ``ACASB_POOL_WORKERS``."""
+        mode = os.getenv("ACASB_POOL_MODE", "thread").strip().lower() or "thread"
+        if mode not in POOL_MODES:
+            logger.warning(f"Unknown ACASB_POOL_MODE={mode}, using thread")
+            mode = "thread"
+        try:
+            workers = int(os.getenv("ACASB_POOL_WORKERS", "0").strip() or 0)
+        except ValueError:
+            workers = 0
+        return cls(mode=mode, workers=workers or None, name=name)
+
+    @property
+    def executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.mode == "process":
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+                logger.info(f"Started {self.name} {self.mode} pool with {self.workers} workers")
+            return self._executor
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        # Only touched from the event loop thread, so no lock is needed.
+        self.in_flight += 1
+        try:
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+        finally:
+            self.in_flight -= 1
+
+    @property
+    def queue_depth(self) -> int:
+        """Submitted tasks still waiting for a free worker."""
+        return max(0, self.in_flight - self.workers)
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,134 @@
+"""
+Batched hybrid extraction: /predict/batch chunks go through one ResNet
+forward pass and give the same vectors as per-image prediction, and
+training extraction reports progress through both of its steps.
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+pytest.importorskip("torchvision")
+
+from ancient_arch_extractor import AncientArchExtractor
+from mlp_inference import HybridInference
+from resnet_hybrid_pipeline import HybridFeatureExtractor, ResNet18FeatureExtractor
+
+
+class OfflineResNet18(ResNet18FeatureExtractor):
+    """Random-init weights, so the test needs no download; counts forward passes."""
+
+    def __init__(self, **kwargs):
+        self.forward_sizes = []
+        super().__init__(**kwargs)
+
+    def _load_model(self):
+        self._torch.manual_seed(0)
+        model = self._models.resnet18(weights=None)
+        backbone = self._nn.Sequential(*list(model.children())[:-1])
+        backbone.eval()
+        return backbone
+
+    def _forward(self, tensors):
+        tensors = list(tensors)
+        self.forward_sizes.append(len(tensors))
+        return super()._forward(tensors)
+
+
+class FakeClassifier:
+    feature_layout = "fused"
+
+    def __init__(self):
+        self.vectors = []
+
+    def predict_single(self, feature_vector):
+        self.vectors.append(feature_vector)
+        return {"prediction": "royal", "confidence": 1.0, "probabilities": {"royal": 1.0, "civilian": 0.0}}
+
+
+def make_inference():
+    inference = HybridInference()
+    inference.model = FakeClassifier()
+    inference.extractor = HybridFeatureExtractor(
+        resnet_extractor=OfflineResNet18(),
+        handcrafted_extractor=AncientArchExtractor(log_sample_rate=0),
+    )
+    return inference
+
+
+def write_images(tmp_path, count: int):
+    rng = np.random.default_rng(0)
+    paths = []
+    for index in range(count):
+        path = str(tmp_path / f"{index}.png")
+        image = cv2.resize(rng.integers(0, 256, (8, 8, 3), dtype=np.uint8), (96, 96), interpolation=cv2.INTER_CUBIC)
+        cv2.imwrite(path, image)
+        paths.append(path)
+    return paths
+
+
+def test_batch_matches_single_predictions(tmp_path):
+    inference = make_inference()
+    paths = write_images(tmp_path, 3)
+    broken = str(tmp_path / "broken.png")
+    with open(broken, "wb") as f:
+        f.write(b"not an image")
+
+    results = inference.predict_batch(paths + [broken])
+    assert [result["success"] for result in results] == [True, True, True, False]
+    assert inference.extractor.resnet_extractor.forward_sizes == [3]
+    batched = inference.model.vectors[:]
+
+    for path, vector in zip(paths, batched):
+        assert inference.predict(path)["success"]
+        assert np.allclose(inference.model.vectors[-1], vector, rtol=0, atol=1e-5)
+
+
+def test_prediction_chunk_uses_one_forward_pass(tmp_path, monkeypatch):
+    monkeypatch.setenv("ACASB_FEATURE_CACHE_MB", "0")
+    monkeypatch.setenv("ACASB_WARMUP", "0")
+    import api_server
+
+    inference = make_inference()
+    monkeypatch.setattr(api_server, "load_inference", lambda request: inference)
+    paths = write_images(tmp_path, api_server.BATCH_CHUNK_SIZE - 1)
+    missing = str(tmp_path / "missing.png")
+
+    request = api_server.BatchRequest(image_paths=paths + [missing], model_type="hybrid")
+    lines = api_server.run_prediction_chunk(request, paths + [missing])
+
+    assert [line["image_path"] for line in lines] == paths + [missing]
+    assert all(line["success"] and line["model_type"] == "hybrid" for line in lines[:-1])
+    assert not lines[-1]["success"]
+    assert inference.extractor.resnet_extractor.forward_sizes == [len(paths)]
+
+
+def test_views_batch_reports_progress_through_handcrafted_step(tmp_path):
+    extractor = HybridFeatureExtractor(
+        resnet_extractor=OfflineResNet18(),
+        handcrafted_extractor=AncientArchExtractor(log_sample_rate=0),
+    )
+    paths = write_images(tmp_path, 20)
+    reports = []
+    handcrafted_batch = extractor.handcrafted_extractor.extract_features_batch
+
+    def recording_batch(*args, **kwargs):
+        reports.append("handcrafted")
+        return handcrafted_batch(*args, **kwargs)
+
+    extractor.handcrafted_extractor.extract_features_batch = recording_batch
+    rows = extractor.extract_views_batch(paths, augment_factor=1, batch_size=8, progress=reports.append)
+
+    assert all(row is not None and row.shape == (2, 512 + 19) for row in rows)
+    split = reports.index("handcrafted")
+    before, after = reports[:split], reports[split + 1:]
+    # The backbone step alone does not report the images as done...
+    assert before and max(before) < len(paths)
+    # ...the handcrafted step keeps reporting until they are.
+    assert len(after) > 1 and after[-1] == len(paths)
+    assert before + after == sorted(before + after)
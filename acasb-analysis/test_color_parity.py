@@ -0,0 +1,91 @@
+"""
+Parity check for the histogram-based colour features.
+
+``extract_color_features`` derives every colour ratio and HSV statistic from
+a hue histogram and a joint S x V histogram. These tests pin it to the
+original mask-based formulas on synthetic HSV planes that sit on every range
+boundary (including the red hue ranges at both ends of the circle and the
+gray/white and black thresholds), and on random BGR images.
+"""
+import itertools
+import os
+import sys
+
+import cv2
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from ancient_arch_extractor import AncientArchExtractor, ImageContext
+
+COLOR_KEYS = [
+    "ratio_yellow", "ratio_red_1", "ratio_red_2", "ratio_blue", "ratio_green",
+    "ratio_gray_white", "ratio_black",
+    "h_mean", "h_std", "s_mean", "s_std", "v_mean", "v_std",
+]
+
+# Values on and either side of every hue range edge, the red ranges at both
+# ends of OpenCV's 0..179 hue circle, and the achromatic thresholds.
+BOUNDARY_HUES = [0, 1, 9, 10, 11, 19, 20, 21, 34, 35, 36, 84, 85, 86, 99, 100, 101, 124, 125, 126, 169, 170, 171, 179]
+BOUNDARY_SATURATIONS = [0, 1, 28, 29, 30, 31, 128, 255]
+BOUNDARY_VALUES = [0, 48, 49, 50, 51, 199, 200, 201, 202, 255]
+
+
+def baseline_color_features(extractor: AncientArchExtractor, hsv_image: np.ndarray) -> dict:
+    """The original per-pixel mask formulas."""
+    h, s, v = cv2.split(hsv_image)
+    total = h.shape[0] * h.shape[1]
+    features = {}
+    for color_name, (h_min, h_max) in extractor.hue_ranges.items():
+        if h_min <= h_max:
+            mask = (h >= h_min) & (h <= h_max)
+        else:
+            mask = (h >= h_min) | (h <= h_max)
+        features[f"ratio_{color_name}"] = float(np.sum(mask) / total)
+    features["ratio_gray_white"] = float(np.sum((s < 30) & (v > 200)) / total)
+    features["ratio_black"] = float(np.sum(v < 50) / total)
+    for name, plane, scale in (("h", h, 180.0), ("s", s, 255.0), ("v", v, 255.0)):
+        features[f"{name}_mean"] = float(np.mean(plane) / scale)
+        features[f"{name}_std"] = float(np.std(plane) / scale)
+    return features
+
+
+def features_from_hsv(extractor: AncientArchExtractor, hsv_image: np.ndarray) -> dict:
+    context = ImageContext(cv2.cvtColor(hsv_image, cv2.COLOR_HSV2BGR))
+    # Feed the exact HSV planes in, bypassing the BGR round trip.
+    context.memo("hsv", lambda: hsv_image)
+    return extractor.extract_color_features(context)
+
+
+def assert_parity(actual: dict, expected: dict) -> None:
+    for key in COLOR_KEYS:
+        assert abs(actual[key] - expected[key]) <= 1e-9, (key, actual[key], expected[key])
+
+
+def test_boundary_grid_matches_masks():
+    extractor = AncientArchExtractor()
+    grid = np.array(list(itertools.product(BOUNDARY_HUES, BOUNDARY_SATURATIONS, BOUNDARY_VALUES)), dtype=np.uint8)
+    hsv_image = grid.reshape(len(BOUNDARY_HUES), -1, 3)
+    assert_parity(features_from_hsv(extractor, hsv_image), baseline_color_features(extractor, hsv_image))
+
+
+def test_single_boundary_values_match_masks():
+    # One uniform image per boundary value, so each threshold decides a
+    # ratio of exactly 0 or 1.
+    extractor = AncientArchExtractor()
+    for hue in BOUNDARY_HUES:
+        hsv_image = np.full((8, 8, 3), (hue, 200, 150), dtype=np.uint8)
+        assert_parity(features_from_hsv(extractor, hsv_image), baseline_color_features(extractor, hsv_image))
+    for saturation, value in itertools.product(BOUNDARY_SATURATIONS, BOUNDARY_VALUES):
+        hsv_image = np.full((8, 8, 3), (90, saturation, value), dtype=np.uint8)
+        assert_parity(features_from_hsv(extractor, hsv_image), baseline_color_features(extractor, hsv_image))
+
+
+def test_random_images_match_masks():
+    extractor = AncientArchExtractor()
+    rng = np.random.default_rng(1)
+    for _ in range(4):
+        image = rng.integers(0, 256, (120, 160, 3), dtype=np.uint8)
+        expected = baseline_color_features(extractor, cv2.cvtColor(image, cv2.COLOR_BGR2HSV))
+        assert_parity(extractor.extract_color_features(image), expected)
@@ -0,0 +1,67 @@
+"""
+Per-image INFO logging is sampled by default and only logs every image when
+``ACASB_EXTRACT_LOG_SAMPLE_RATE`` asks for it.
+"""
+import logging
+import os
+import random
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from ancient_arch_extractor import DEFAULT_LOG_SAMPLE_RATE, FEATURE_KEYS, AncientArchExtractor
+
+IMAGES = 200
+
+
+def info_lines(caplog, name: str):
+    return [record for record in caplog.records if record.name == name and record.levelno == logging.INFO]
+
+
+def make_images(count: int):
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, (48, 64, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def test_default_rate_does_not_log_every_image(monkeypatch, caplog):
+    monkeypatch.delenv("ACASB_EXTRACT_LOG_SAMPLE_RATE", raising=False)
+    extractor = AncientArchExtractor()
+    assert extractor.log_sample_rate == DEFAULT_LOG_SAMPLE_RATE < 0.1
+
+    random.seed(0)
+    caplog.set_level(logging.INFO)
+    for image in make_images(IMAGES):
+        extractor.extract_features_from_array(image)
+
+    # Two lines per sampled image: about 4 expected here, not 400.
+    assert len(info_lines(caplog, "ancient_arch_extractor")) < IMAGES // 10
+
+
+def test_env_opts_in_to_every_image(monkeypatch, caplog):
+    monkeypatch.setenv("ACASB_EXTRACT_LOG_SAMPLE_RATE", "1")
+    extractor = AncientArchExtractor()
+    caplog.set_level(logging.INFO)
+    for image in make_images(3):
+        extractor.extract_features_from_array(image)
+    assert len(info_lines(caplog, "ancient_arch_extractor")) == 2 * 3
+
+
+def test_batch_predictions_do_not_log_per_row(caplog):
+    from sklearn.neural_network import MLPClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    from mlp_inference import MLPInference
+
+    rng = np.random.default_rng(0)
+    X, y = rng.normal(size=(20, len(FEATURE_KEYS))), np.arange(20) % 2
+    inference = MLPInference()
+    inference.scaler = StandardScaler().fit(X)
+    inference.model = MLPClassifier(hidden_layer_sizes=(4,), max_iter=20).fit(X, y)
+
+    caplog.set_level(logging.INFO)
+    for row in X:
+        assert inference.predict_features(dict(zip(FEATURE_KEYS, row)), summary=False)["success"]
+    assert info_lines(caplog, "mlp_inference") == []
@@ -0,0 +1,114 @@
+"""
+Checks for the persistent feature cache: key separation, LRU eviction at
+``max_bytes``, reconnecting after a fork, and the hybrid extractor relying
+on it instead of an in-memory memo.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from feature_cache import FeatureCache
+
+VECTOR_BYTES = 80
+
+
+def vector(seed: int) -> np.ndarray:
+    return np.full(VECTOR_BYTES // 4, seed, dtype=np.float32)
+
+
+def test_keys_are_separated_by_version_and_namespace(tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    key = cache.content_key(b"image bytes")
+    cache.put("handcrafted", key, "v1", vector(1))
+
+    assert np.array_equal(cache.get("handcrafted", key, "v1"), vector(1))
+    assert cache.get("handcrafted", key, "v2") is None
+    assert cache.get("resnet18", key, "v1") is None
+
+    cache.put("handcrafted", key, "v2", vector(2))
+    assert np.array_equal(cache.get("handcrafted", key, "v1"), vector(1))
+    assert np.array_equal(cache.get("handcrafted", key, "v2"), vector(2))
+    assert cache.lookup_counts()["handcrafted"] == {"hit": 3, "miss": 1}
+
+
+def test_content_key_covers_array_layout():
+    data = np.arange(12, dtype=np.uint8)
+    assert FeatureCache.content_key(data) == FeatureCache.content_key(data.copy())
+    assert FeatureCache.content_key(data) != FeatureCache.content_key(data.reshape(3, 4))
+    assert FeatureCache.content_key(b"a") != FeatureCache.content_key(b"b")
+
+
+def test_evicts_least_recently_used_at_max_bytes(tmp_path):
+    cache = FeatureCache(str(tmp_path), max_bytes=10 * VECTOR_BYTES)
+    cache.touch_interval = 0.0
+    for index in range(10):
+        cache.put("ns", f"key{index}", "v", vector(index))
+    assert cache.total_bytes() == 10 * VECTOR_BYTES
+
+    # Reading key0 makes key1 and key2 the least recently used.
+    assert cache.get("ns", "key0", "v") is not None
+    cache.put("ns", "key10", "v", vector(10))
+
+    # Over max_bytes: evicted down to evict_to_fraction (720 bytes).
+    assert cache.total_bytes() == 9 * VECTOR_BYTES
+    assert cache.get("ns", "key1", "v") is None
+    assert cache.get("ns", "key2", "v") is None
+    for index in [0] + list(range(3, 11)):
+        assert np.array_equal(cache.get("ns", f"key{index}", "v"), vector(index)), index
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_reconnects_after_fork(tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    cache.put("ns", "parent", "v", vector(1))
+    parent_connection = cache._connection()
+
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            child_connection = cache._connection()
+            if child_connection is not parent_connection and cache.get("ns", "parent", "v") is not None:
+                cache.put("ns", "child", "v", vector(2))
+                code = 0
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+
+    assert os.WEXITSTATUS(status) == 0
+    assert cache._connection() is parent_connection
+    assert np.array_equal(cache.get("ns", "child", "v"), vector(2))
+
+
+class FakeResNet:
+    def extract_features(self, image_path, augmented=False):
+        return np.zeros(512, dtype=np.float32)
+
+
+def test_hybrid_handcrafted_features_come_from_the_cache(tmp_path):
+    import cv2
+    from ancient_arch_extractor import AncientArchExtractor
+    from resnet_hybrid_pipeline import HybridFeatureExtractor
+
+    cache = FeatureCache(str(tmp_path / "cache"))
+    handcrafted = AncientArchExtractor(feature_cache=cache, log_sample_rate=0)
+    hybrid = HybridFeatureExtractor(resnet_extractor=FakeResNet(), handcrafted_extractor=handcrafted)
+    rng = np.random.default_rng(0)
+    path = str(tmp_path / "image.png")
+
+    cv2.imwrite(path, rng.integers(0, 256, (64, 64, 3), dtype=np.uint8))
+    first = hybrid.extract_features(path)
+    assert np.array_equal(hybrid.extract_features(path), first)
+    assert cache.lookup_counts()["handcrafted"] == {"hit": 1, "miss": 1}
+
+    # A file rewritten under the same name is a new cache key.
+    cv2.imwrite(path, rng.integers(0, 256, (64, 64, 3), dtype=np.uint8))
+    assert not np.array_equal(hybrid.extract_features(path), first)
+    assert cache.lookup_counts()["handcrafted"] == {"hit": 1, "miss": 2}
+    # Nothing accumulates on the extractor between calls.
+    assert not any(isinstance(value, dict) for value in vars(hybrid).values())
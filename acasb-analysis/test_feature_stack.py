@@ -0,0 +1,53 @@
+"""
+Row-for-row check of the stacked feature path against ``compute_features``.
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from ancient_arch_extractor import FEATURE_KEYS, AncientArchExtractor
+
+TOLERANCE = 1e-9
+
+
+def make_images(count: int = 6):
+    rng = np.random.default_rng(3)
+    images = []
+    for index in range(count):
+        blocks = rng.integers(0, 256, (12, 16, 3), dtype=np.uint8)
+        size = (320 + 40 * index, 240 + 30 * index)
+        images.append(cv2.resize(blocks, size, interpolation=cv2.INTER_CUBIC))
+    # Flat light and near-black images hit the achromatic ranges.
+    images.append(np.full((240, 320, 3), 230, dtype=np.uint8))
+    images.append(np.full((240, 320, 3), 20, dtype=np.uint8))
+    return images
+
+
+def test_stack_matches_per_image_rows():
+    extractor = AncientArchExtractor(log_sample_rate=0)
+    images = make_images()
+    stacked = extractor.compute_features_stack(images)
+    assert stacked.shape == (len(images), len(FEATURE_KEYS))
+    for row, image in zip(stacked, images):
+        feature_dict, _ = extractor.compute_features(image)
+        assert np.allclose(row, [feature_dict[key] for key in FEATURE_KEYS], rtol=0, atol=TOLERANCE)
+
+
+def test_stack_matches_per_image_rows_for_subsets():
+    extractor = AncientArchExtractor(log_sample_rate=0)
+    images = make_images(3)
+    for keys in (["ratio_gray_white", "ratio_black"], ["h_std", "ratio_red_2", "entropy"], ["v_mean", "contrast"]):
+        stacked = extractor.compute_features_stack(images, keys)
+        for row, image in zip(stacked, images):
+            feature_dict, _ = extractor.compute_features(image, features=keys)
+            assert np.allclose(row, [feature_dict[key] for key in keys], rtol=0, atol=TOLERANCE), keys
+
+
+def test_empty_stack():
+    extractor = AncientArchExtractor(log_sample_rate=0)
+    assert extractor.compute_features_stack([], ["entropy"]).shape == (0, 1)
@@ -0,0 +1,116 @@
+"""
+Parity check for the bincount GLCM kernel against scikit-image.
+
+The reference values below were produced with
+``skimage.feature.graycomatrix(..., symmetric=True, normed=True)`` and
+``graycoprops`` (scikit-image 0.26), averaged over offsets. scikit-image is
+no longer a dependency, so they are stored rather than recomputed.
+Contrast and dissimilarity are in graycoprops units; the extractor's
+features divide them by ``levels - 1``.
+"""
+import os
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from ancient_arch_extractor import AncientArchExtractor
+
+TOLERANCE = 1e-7
+
+CONFIGS = {
+    # The 256-level, distance 1, angle 0 matrix existing models use.
+    "parity": dict(glcm_levels=256, glcm_distances=(1,), glcm_angles=(0.0,)),
+    "quantized": dict(glcm_levels=64, glcm_distances=(1, 2), glcm_angles=(0.0, np.pi / 2)),
+}
+
+REFERENCE = {
+    ("hashed", "parity"): {
+        "contrast": 12791.1917989418, "dissimilarity": 99.9947089947, "homogeneity": 0.0001653759,
+        "ASM": 0.0013586196, "energy": 0.0368594571, "correlation": -0.1725854016,
+    },
+    ("hashed", "quantized"): {
+        "contrast": 594.4025184337, "dissimilarity": 18.5667429706, "homogeneity": 0.0287940367,
+        "ASM": 0.0059518458, "energy": 0.0768807439, "correlation": 0.1289358105,
+    },
+    ("textured", "parity"): {
+        "contrast": 432.3505291005, "dissimilarity": 6.705026455, "homogeneity": 0.1349580439,
+        "ASM": 0.0010761571, "energy": 0.0328048328, "correlation": 0.9301794644,
+    },
+    ("textured", "quantized"): {
+        "contrast": 37.1470814576, "dissimilarity": 2.3285329169, "homogeneity": 0.3572567999,
+        "ASM": 0.0041383878, "energy": 0.0642729867, "correlation": 0.9026705128,
+    },
+    ("constant", "parity"): {
+        "contrast": 0.0, "dissimilarity": 0.0, "homogeneity": 1.0, "ASM": 1.0, "energy": 1.0, "correlation": 1.0,
+    },
+    ("constant", "quantized"): {
+        "contrast": 0.0, "dissimilarity": 0.0, "homogeneity": 1.0, "ASM": 1.0, "energy": 1.0, "correlation": 1.0,
+    },
+}
+
+
+def hashed_image(shape=(48, 64)) -> np.ndarray:
+    # Integer hash rather than an RNG, so the image never changes.
+    n = np.arange(shape[0] * shape[1], dtype=np.uint64)
+    return (((n * np.uint64(2654435761)) >> np.uint64(13)) % np.uint64(256)).astype(np.uint8).reshape(shape)
+
+
+def textured_image(shape=(48, 64)) -> np.ndarray:
+    rows, cols = np.indices(shape)
+    return ((rows * 3 + cols * 2 + hashed_image(shape) % 16) % 256).astype(np.uint8)
+
+
+IMAGES = {
+    "hashed": hashed_image,
+    "textured": textured_image,
+    "constant": lambda: np.full((48, 64), 137, dtype=np.uint8),
+}
+
+
+def energy_and_correlation(glcm: np.ndarray):
+    """graycoprops' energy and correlation, averaged over offsets."""
+    levels = glcm.shape[1]
+    i, j = np.indices((levels, levels))
+    energies, correlations = [], []
+    for matrix in glcm:
+        energies.append(np.sqrt(np.sum(matrix ** 2)))
+        mean_i, mean_j = np.sum(i * matrix), np.sum(j * matrix)
+        std_i = np.sqrt(np.sum(matrix * (i - mean_i) ** 2))
+        std_j = np.sqrt(np.sum(matrix * (j - mean_j) ** 2))
+        if std_i < 1e-15 or std_j < 1e-15:
+            correlations.append(1.0)
+        else:
+            correlations.append(np.sum(matrix * (i - mean_i) * (j - mean_j)) / (std_i * std_j))
+    return float(np.mean(energies)), float(np.mean(correlations))
+
+
+def test_glcm_matches_skimage_reference():
+    for (image_name, config_name), expected in REFERENCE.items():
+        extractor = AncientArchExtractor(**CONFIGS[config_name])
+        gray = IMAGES[image_name]()
+        scale = extractor.glcm_levels - 1
+
+        features = extractor.extract_glcm_features(gray[:, :, None].repeat(3, axis=2))
+        energy, correlation = energy_and_correlation(extractor.compute_glcm(gray))
+        actual = {
+            "contrast": features["contrast"] * scale,
+            "dissimilarity": features["dissimilarity"] * scale,
+            "homogeneity": features["homogeneity"],
+            "ASM": features["asm"],
+            "energy": energy,
+            "correlation": correlation,
+        }
+        for name, value in expected.items():
+            tolerance = TOLERANCE * max(1.0, abs(value))
+            assert abs(actual[name] - value) <= tolerance, (image_name, config_name, name, actual[name], value)
+
+
+def test_glcm_is_symmetric_and_normalized():
+    extractor = AncientArchExtractor(**CONFIGS["quantized"])
+    glcm = extractor.compute_glcm(textured_image())
+    assert glcm.shape == (4, 64, 64)
+    assert np.allclose(glcm, glcm.transpose(0, 2, 1))
+    assert np.allclose(glcm.sum(axis=(1, 2)), 1.0)
@@ -0,0 +1,128 @@
+"""
+Tolerance check for the large-photo fast path.
+
+Compares reduced-scale decode + resize-before-CLAHE against the original
+full-resolution pipeline on synthetic photos: large ones stay within
+tolerance, mid-size ones below the threshold are not touched. Run directly
+(``python test_large_image_fast_path.py``) or through pytest.
+"""
+import inspect
+import os
+import sys
+import tempfile
+
+import cv2
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from ancient_arch_extractor import FEATURE_KEYS, AncientArchExtractor
+from image_io import read_image_size
+
+PHOTO_SIZE = (4032, 3024)
+# Just above the fast-path threshold (shorter side 4x the 400 px target),
+# where the shrink before CLAHE moves features the most.
+THRESHOLD_PHOTO_SIZE = (2400, 1600)
+MID_SIZES = ((600, 450), (1200, 900), (1700, 1000))
+ABS_TOLERANCE = 0.02
+CONTRAST_REL_TOLERANCE = 0.02
+RESNET_REL_TOLERANCE = 0.01
+
+
+def make_photo(path: str, size=PHOTO_SIZE, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    width, height = size
+    blocks = rng.integers(0, 256, (height // 64, width // 64, 3), dtype=np.uint8)
+    image = cv2.resize(blocks, (width, height), interpolation=cv2.INTER_CUBIC)
+    noise = rng.normal(0, 8, image.shape)
+    image = np.clip(image + noise, 0, 255).astype(np.uint8)
+    cv2.imwrite(path, image, [cv2.IMWRITE_JPEG_QUALITY, 92])
+
+
+def compare_handcrafted(image_path: str):
+    exact = AncientArchExtractor(large_image_fast_path=False)
+    fast = AncientArchExtractor(large_image_fast_path=True)
+    _, exact_vector = exact.extract_features(image_path)
+    _, fast_vector = fast.extract_features(image_path)
+    return exact_vector.astype(np.float64), fast_vector.astype(np.float64)
+
+
+def test_header_size_matches_decode():
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("photo.jpg", "photo.png"):
+            path = os.path.join(tmp, name)
+            make_photo(path, size=(640, 480))
+            image_format, width, height = read_image_size(path)
+            assert image_format in ("jpeg", "png")
+            assert (width, height) == (640, 480)
+
+
+def test_fast_path_within_tolerance():
+    for size in (PHOTO_SIZE, THRESHOLD_PHOTO_SIZE):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "photo.jpg")
+            make_photo(path, size=size)
+            exact_vector, fast_vector = compare_handcrafted(path)
+
+        assert np.any(exact_vector != 0.0), "exact extraction failed"
+        assert not np.array_equal(exact_vector, fast_vector), f"fast path not taken for {size}"
+        for index, key in enumerate(FEATURE_KEYS):
+            exact_value, fast_value = exact_vector[index], fast_vector[index]
+            if key == "contrast":
+                assert abs(fast_value - exact_value) <= CONTRAST_REL_TOLERANCE * abs(exact_value), (size, key)
+            else:
+                assert abs(fast_value - exact_value) <= ABS_TOLERANCE, (size, key)
+
+
+def test_mid_size_images_unchanged():
+    for size in MID_SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "photo.jpg")
+            make_photo(path, size=size)
+            exact_vector, fast_vector = compare_handcrafted(path)
+        assert np.array_equal(exact_vector, fast_vector), size
+
+
+def test_resnet_fast_decode_within_tolerance():
+    import pytest
+    pytest.importorskip("torchvision")
+    from resnet_hybrid_pipeline import ResNet18FeatureExtractor
+
+    class OfflineResNet18(ResNet18FeatureExtractor):
+        # Random-init weights: no download, same architecture and decode path.
+        def _load_model(self):
+            self._torch.manual_seed(0)
+            model = self._models.resnet18(weights=None)
+            backbone = self._nn.Sequential(*list(model.children())[:-1])
+            backbone.eval()
+            return backbone
+
+    exact = OfflineResNet18(fast_decode=False)
+    fast = OfflineResNet18(fast_decode=True)
+    fast.model = exact.model
+    assert inspect.signature(ResNet18FeatureExtractor).parameters["fast_decode"].default is False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "photo.jpg")
+        make_photo(path)
+        exact_features = exact.extract_features(path)
+        fast_features = fast.extract_features(path)
+
+    relative_error = np.linalg.norm(exact_features - fast_features) / np.linalg.norm(exact_features)
+    assert 0.0 < relative_error < RESNET_REL_TOLERANCE
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "photo.jpg")
+        make_photo(path)
+        exact_vector, fast_vector = compare_handcrafted(path)
+
+    print("=" * 70)
+    print(f"{'feature':<18}{'exact':>12}{'fast':>12}{'abs diff':>12}")
+    print("=" * 70)
+    for index, key in enumerate(FEATURE_KEYS):
+        diff = abs(fast_vector[index] - exact_vector[index])
+        print(f"{key:<18}{exact_vector[index]:>12.4f}{fast_vector[index]:>12.4f}{diff:>12.4f}")
+    print("=" * 70)
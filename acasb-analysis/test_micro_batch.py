@@ -0,0 +1,141 @@
+"""
+Threaded checks for MicroBatcher's leader/ticket hand-off with a fake
+``run_batch``.
+"""
+import os
+import sys
+import threading
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from micro_batch import MicroBatcher
+
+JOIN_TIMEOUT = 10.0
+
+
+class FakeRun:
+    """Returns ``item * 10`` per item; fails a whole batch containing ``bad``."""
+
+    def __init__(self, delay: float = 0.02, bad=None):
+        self.delay = delay
+        self.bad = bad
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, items):
+        with self.lock:
+            self.batches.append(list(items))
+        time.sleep(self.delay)
+        if self.bad in items:
+            raise ValueError(f"bad item {self.bad}")
+        return [item * 10 for item in items]
+
+
+def run_callers(batcher: MicroBatcher, items, use_ticket: bool = True):
+    results, errors = {}, {}
+    barrier = threading.Barrier(len(items))
+
+    def call(item):
+        barrier.wait()
+        try:
+            if use_ticket:
+                with batcher.expecting() as ticket:
+                    results[item] = batcher.submit(item, ticket)
+            else:
+                results[item] = batcher.submit(item)
+        except Exception as e:
+            errors[item] = e
+
+    threads = [threading.Thread(target=call, args=(item,)) for item in items]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(JOIN_TIMEOUT)
+    assert not any(thread.is_alive() for thread in threads), "callers deadlocked"
+    return results, errors
+
+
+def test_every_caller_gets_its_own_row():
+    for use_ticket in (True, False):
+        run = FakeRun()
+        batcher = MicroBatcher(run, max_batch_size=4, max_wait_ms=20)
+        items = list(range(20))
+        results, errors = run_callers(batcher, items, use_ticket)
+
+        assert not errors
+        assert results == {item: item * 10 for item in items}
+        assert sorted(item for batch in run.batches for item in batch) == items
+        assert max(len(batch) for batch in run.batches) <= 4
+        # Concurrent callers were actually coalesced.
+        assert len(run.batches) < len(items)
+        assert batcher.stats()["items"] == len(items)
+
+
+def test_error_reaches_every_waiter_in_the_batch():
+    run = FakeRun(bad=5)
+    batcher = MicroBatcher(run, max_batch_size=4, max_wait_ms=20)
+    items = list(range(12))
+    results, errors = run_callers(batcher, items)
+
+    failed_batch = next(batch for batch in run.batches if 5 in batch)
+    assert set(errors) == set(failed_batch)
+    assert all(isinstance(error, ValueError) for error in errors.values())
+    assert results == {item: item * 10 for item in items if item not in failed_batch}
+
+    # The batcher keeps working after a failed batch.
+    assert batcher.submit(7) == 70
+
+
+def test_leader_waits_for_announced_callers():
+    run = FakeRun(delay=0.0)
+    batcher = MicroBatcher(run, max_batch_size=8, max_wait_ms=2000)
+    announced = threading.Event()
+    results = {}
+
+    def slow_caller():
+        with batcher.expecting() as ticket:
+            announced.set()
+            time.sleep(0.1)
+            results["slow"] = batcher.submit(2, ticket)
+
+    thread = threading.Thread(target=slow_caller)
+    thread.start()
+    announced.wait()
+    started = time.monotonic()
+    results["fast"] = batcher.submit(1)
+    elapsed = time.monotonic() - started
+    thread.join(JOIN_TIMEOUT)
+
+    assert results == {"fast": 10, "slow": 20}
+    assert run.batches == [[1, 2]]
+    # Released once the announced item arrived, well before max_wait.
+    assert elapsed < 1.0
+
+
+def test_lone_and_abandoned_callers_do_not_wait():
+    run = FakeRun(delay=0.0)
+    batcher = MicroBatcher(run, max_batch_size=8, max_wait_ms=2000)
+
+    started = time.monotonic()
+    assert batcher.submit(3) == 30
+    assert time.monotonic() - started < 0.5
+
+    # A caller that announces itself but never submits only holds the
+    # leader until it leaves expecting().
+    announced = threading.Event()
+
+    def abandoning_caller():
+        with batcher.expecting():
+            announced.set()
+            time.sleep(0.1)
+
+    thread = threading.Thread(target=abandoning_caller)
+    thread.start()
+    announced.wait()
+    started = time.monotonic()
+    assert batcher.submit(4) == 40
+    assert time.monotonic() - started < 1.0
+    thread.join(JOIN_TIMEOUT)
+    assert run.batches == [[3], [4]]
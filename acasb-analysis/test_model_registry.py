@@ -0,0 +1,158 @@
+"""
+ModelRegistry with a fake factory: load-once, LRU eviction and the
+background hot swap when model files change.
+"""
+import os
+import sys
+import threading
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from model_registry import ModelRegistry
+
+SWAP_TIMEOUT = 5.0
+
+
+class FakeModel:
+    """Loads the text of one model file; a file reading "broken" fails to load."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.content = None
+
+    def model_files(self):
+        return [self.path]
+
+    def load_model(self) -> bool:
+        with open(self.path) as f:
+            self.content = f.read()
+        return self.content != "broken"
+
+
+class FakeFactory:
+    def __init__(self):
+        self.loads = []
+        self.lock = threading.Lock()
+
+    def __call__(self, model_type, model_path, device):
+        with self.lock:
+            self.loads.append(model_path)
+        return FakeModel(model_path)
+
+
+def write_model(path, content: str, mtime_ns: int = None) -> str:
+    with open(path, "w") as f:
+        f.write(content)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+
+def wait_idle(registry: ModelRegistry) -> None:
+    deadline = time.monotonic() + SWAP_TIMEOUT
+    while any(entry.reloading for entry in list(registry._entries.values())):
+        assert time.monotonic() < deadline, "reload did not finish"
+        time.sleep(0.01)
+
+
+def test_loads_each_key_once(tmp_path):
+    factory = FakeFactory()
+    registry = ModelRegistry(factory, settle_seconds=0)
+    path = write_model(tmp_path / "a.pkl", "a1")
+
+    threads = [threading.Thread(target=registry.get, args=("mlp", path, "cpu")) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert registry.get("mlp", path, "cpu") is registry.get("mlp", path, "cpu")
+    assert factory.loads == [path]
+
+
+def test_evicts_least_recently_used_model(tmp_path):
+    factory = FakeFactory()
+    registry = ModelRegistry(factory, settle_seconds=0, max_models=2, max_bytes=0)
+    a, b, c = (write_model(tmp_path / f"{name}.pkl", name) for name in "abc")
+
+    model_a = registry.get("mlp", a, "cpu")
+    registry.get("mlp", b, "cpu")
+    assert registry.get("mlp", a, "cpu") is model_a
+    registry.get("mlp", c, "cpu")
+
+    # b was least recently used.
+    assert registry.stats()["models"] == 2
+    assert registry.event_counts()["eviction"] == 1
+    assert registry.get("mlp", a, "cpu") is model_a
+    registry.get("mlp", b, "cpu")
+    assert factory.loads == [a, b, c, b]
+
+
+def test_evicts_down_to_max_bytes(tmp_path):
+    factory = FakeFactory()
+    registry = ModelRegistry(factory, settle_seconds=0, max_models=10, max_bytes=250)
+    paths = [write_model(tmp_path / f"{index}.pkl", str(index) * 100) for index in range(3)]
+    for path in paths:
+        registry.get("mlp", path, "cpu")
+
+    assert registry.stats() == {"models": 2, "bytes": 200}
+    assert registry.event_counts()["eviction"] == 1
+
+
+def test_failed_load_is_counted(tmp_path):
+    registry = ModelRegistry(FakeFactory(), settle_seconds=0)
+    path = write_model(tmp_path / "broken.pkl", "broken")
+    assert registry.get("mlp", path, "cpu") is None
+    assert registry.event_counts()["load_failed"] == 1
+
+
+def test_swaps_in_changed_model(tmp_path):
+    factory = FakeFactory()
+    registry = ModelRegistry(factory, settle_seconds=0)
+    path = write_model(tmp_path / "model.pkl", "version 1", mtime_ns=1_000_000_000)
+    old = registry.get("mlp", path, "cpu")
+
+    write_model(path, "version 2", mtime_ns=2_000_000_000)
+    # The first get after the change still returns the old model and
+    # starts the reload in the background.
+    assert registry.get("mlp", path, "cpu") is old
+    wait_idle(registry)
+
+    new = registry.get("mlp", path, "cpu")
+    assert new is not old
+    assert (old.content, new.content) == ("version 1", "version 2")
+    assert registry.event_counts()["reload"] == 1
+
+
+def test_touched_model_with_same_content_is_kept(tmp_path):
+    factory = FakeFactory()
+    registry = ModelRegistry(factory, settle_seconds=0)
+    path = write_model(tmp_path / "model.pkl", "same", mtime_ns=1_000_000_000)
+    old = registry.get("mlp", path, "cpu")
+
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+    registry.get("mlp", path, "cpu")
+    wait_idle(registry)
+
+    assert registry.get("mlp", path, "cpu") is old
+    assert factory.loads == [path]
+    assert registry.event_counts()["reload"] == 0
+
+
+def test_broken_replacement_keeps_previous_model(tmp_path):
+    factory = FakeFactory()
+    registry = ModelRegistry(factory, settle_seconds=0)
+    path = write_model(tmp_path / "model.pkl", "good", mtime_ns=1_000_000_000)
+    old = registry.get("mlp", path, "cpu")
+
+    write_model(path, "broken", mtime_ns=2_000_000_000)
+    registry.get("mlp", path, "cpu")
+    wait_idle(registry)
+
+    assert registry.get("mlp", path, "cpu") is old
+    # The same broken file is not retried on every request.
+    wait_idle(registry)
+    assert registry.event_counts()["reload_failed"] == 1
+    assert len(factory.loads) == 2
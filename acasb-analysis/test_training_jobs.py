@@ -0,0 +1,50 @@
+"""
+End-to-end check for background training jobs.
+
+Submits an MLP training job on a tiny synthetic dataset with an extraction
+pool of two processes, which the job process must be able to start, and
+waits for it to succeed.
+"""
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+JOB_TIMEOUT = 180.0
+
+
+def make_dataset(base_dir: str, per_class: int = 12) -> None:
+    rng = np.random.default_rng(0)
+    for category, tint in (("royal", (0, 60, 200)), ("civilian", (160, 160, 160))):
+        os.makedirs(os.path.join(base_dir, category))
+        for index in range(per_class):
+            image = np.clip(rng.normal(tint, 40, (64, 64, 3)), 0, 255).astype(np.uint8)
+            cv2.imwrite(os.path.join(base_dir, category, f"{index}.png"), image)
+
+
+def test_mlp_job_with_extraction_pool_succeeds(tmp_path, monkeypatch):
+    # The job process re-imports api_server, so it sees these as well.
+    monkeypatch.setenv("ACASB_FEATURE_CACHE_MB", "0")
+    monkeypatch.setenv("ACASB_TRAIN_STORE", "0")
+    import api_server
+    from training_jobs import FINISHED_STATUSES, TrainingJobs
+
+    make_dataset(str(tmp_path / "dataset"))
+    jobs = TrainingJobs(api_server.run_training, job_dir=str(tmp_path / "jobs"), nice=0, cpus=2)
+    request = api_server.TrainRequest(base_dir=str(tmp_path / "dataset"), save_dir=str(tmp_path / "models"))
+    job = jobs.submit(request, "mlp")
+
+    deadline = time.monotonic() + JOB_TIMEOUT
+    while job["status"] not in FINISHED_STATUSES and time.monotonic() < deadline:
+        time.sleep(0.2)
+        job = jobs.get(job["job_id"])
+    jobs.shutdown()
+
+    assert job["status"] == "succeeded", job["error"]
+    assert job["result"]["samples_processed"] == 24
+    assert os.path.exists(tmp_path / "models" / "mlp_model.pkl")
@@ -0,0 +1,146 @@
+"""
+TrainingFeatureStore reuse rules: unchanged, touched, changed, renamed and
+deleted files.
+"""
+import os
+import sqlite3
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from training_store import TrainingFeatureStore
+
+NAMESPACE, VERSION = "test", "v1"
+
+
+class FakeExtract:
+    """Two views per file: the byte sum and the length, then their negation."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, paths, progress):
+        self.calls.append([os.path.basename(path) for path in paths])
+        rows = []
+        for done, path in enumerate(paths, 1):
+            with open(path, "rb") as f:
+                data = f.read()
+            base = np.array([sum(data), len(data)], dtype=np.float32)
+            rows.append(None if data == b"unreadable" else np.stack([base, -base]))
+            progress(done)
+        return rows
+
+    def extracted(self):
+        return sorted(name for call in self.calls for name in call)
+
+
+def write_file(path, content: bytes, mtime_ns: int = 1_000_000_000) -> str:
+    path.write_bytes(content)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+
+def expected_row(content: bytes, views: int = 2) -> np.ndarray:
+    base = np.array([sum(content), len(content)], dtype=np.float32)
+    return np.stack([base, -base])[:views]
+
+
+def stored_paths(store: TrainingFeatureStore):
+    with sqlite3.connect(store.db_path) as connection:
+        rows = connection.execute("SELECT path FROM training_features").fetchall()
+    return sorted(os.path.basename(path) for (path,) in rows)
+
+
+def load(store, paths, extract, views=2):
+    return store.load_or_extract(NAMESPACE, VERSION, paths, extract, views=views)
+
+
+def test_unchanged_files_are_reused(tmp_path):
+    store = TrainingFeatureStore(str(tmp_path / "store"), chunk_size=2)
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    contents = {f"{name}.png": name.encode() * 10 for name in "abcde"}
+    paths = [write_file(data_dir / name, content) for name, content in contents.items()]
+
+    first = FakeExtract()
+    rows, reused = load(store, paths, first)
+    assert reused == 0
+    assert first.extracted() == sorted(contents)
+    # Extraction runs in chunks of chunk_size.
+    assert [len(call) for call in first.calls] == [2, 2, 1]
+
+    second = FakeExtract()
+    again, reused = load(store, paths, second)
+    assert reused == len(paths)
+    assert second.calls == []
+    for row, stored, content in zip(rows, again, contents.values()):
+        np.testing.assert_array_equal(stored, expected_row(content))
+        np.testing.assert_array_equal(stored, row)
+
+    # Fewer views come from the stored rows; more views need extraction.
+    fewer, reused = load(store, paths, FakeExtract(), views=1)
+    assert reused == len(paths)
+    np.testing.assert_array_equal(fewer[0], expected_row(contents["a.png"], views=1))
+    more = FakeExtract()
+    assert load(store, paths[:1], more, views=3)[1] == 0
+    assert more.extracted() == ["a.png"]
+
+
+def test_touched_and_changed_files(tmp_path):
+    store = TrainingFeatureStore(str(tmp_path / "store"))
+    touched = write_file(tmp_path / "touched.png", b"same content")
+    changed = write_file(tmp_path / "changed.png", b"old content")
+    load(store, [touched, changed], FakeExtract())
+
+    os.utime(touched, ns=(2_000_000_000, 2_000_000_000))
+    write_file(tmp_path / "changed.png", b"new content!", mtime_ns=2_000_000_000)
+    extract = FakeExtract()
+    rows, reused = load(store, [touched, changed], extract)
+
+    # The touched file is rehashed and reused; the changed one is re-extracted.
+    assert reused == 1
+    assert extract.extracted() == ["changed.png"]
+    np.testing.assert_array_equal(rows[1], expected_row(b"new content!"))
+
+    # Both rows now carry the new stat, so a third run reads nothing.
+    extract = FakeExtract()
+    assert load(store, [touched, changed], extract)[1] == 2
+    assert extract.calls == []
+
+
+def test_renamed_file_is_relinked_and_deleted_file_pruned(tmp_path):
+    store = TrainingFeatureStore(str(tmp_path / "store"))
+    old = write_file(tmp_path / "old.png", b"moved image")
+    gone = write_file(tmp_path / "gone.png", b"deleted image")
+    kept = write_file(tmp_path / "kept.png", b"kept image")
+    load(store, [old, gone, kept], FakeExtract())
+
+    new = str(tmp_path / "new.png")
+    os.rename(old, new)
+    os.remove(gone)
+    extract = FakeExtract()
+    rows, reused = load(store, [new, kept], extract)
+
+    assert reused == 2
+    assert extract.calls == []
+    np.testing.assert_array_equal(rows[0], expected_row(b"moved image"))
+    assert stored_paths(store) == ["kept.png", "new.png"]
+
+
+def test_other_datasets_and_failures_are_not_stored(tmp_path):
+    store = TrainingFeatureStore(str(tmp_path / "store"))
+    first = write_file(tmp_path / "first.png", b"first dataset")
+    broken = write_file(tmp_path / "broken.png", b"unreadable")
+    load(store, [first], FakeExtract())
+
+    # A run over a different set of files keeps rows whose files still exist.
+    rows, _ = load(store, [broken], FakeExtract())
+    assert rows == [None]
+    assert stored_paths(store) == ["first.png"]
+
+    extract = FakeExtract()
+    assert load(store, [first, broken], extract)[1] == 1
+    assert extract.extracted() == ["broken.png"]
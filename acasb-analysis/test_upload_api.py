@@ -0,0 +1,70 @@
+"""
+Upload endpoints must reject bytes that do not decode as an image instead
+of reporting all-zero features as a successful analysis.
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+NOT_AN_IMAGE = b"this is not an image" * 16
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("ACASB_FEATURE_CACHE_MB", "0")
+    monkeypatch.setenv("ACASB_WARMUP", "0")
+    from fastapi.testclient import TestClient
+
+    import api_server
+    return TestClient(api_server.app)
+
+
+def encoded_image() -> bytes:
+    rng = np.random.default_rng(0)
+    image = cv2.resize(rng.integers(0, 256, (8, 8, 3), dtype=np.uint8), (96, 96), interpolation=cv2.INTER_CUBIC)
+    ok, encoded = cv2.imencode(".png", image)
+    assert ok
+    return encoded.tobytes()
+
+
+def test_analyze_upload_rejects_undecodable_bytes(client):
+    response = client.post("/analyze/upload", content=NOT_AN_IMAGE, headers={"content-type": "application/octet-stream"})
+    assert response.status_code == 422
+    assert "Cannot decode uploaded image" in response.json()["detail"]
+
+
+def test_analyze_predict_upload_rejects_undecodable_bytes(client):
+    response = client.post("/analyze_predict/upload", content=NOT_AN_IMAGE, headers={"content-type": "application/octet-stream"})
+    assert response.status_code == 422
+
+
+def test_analyze_upload_accepts_images(client):
+    response = client.post("/analyze/upload", content=encoded_image(), headers={"content-type": "application/octet-stream"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["success"] is True
+    assert body["entropy"] > 0
+
+
+def test_mlp_predict_from_bytes_raises_on_undecodable_bytes():
+    from sklearn.neural_network import MLPClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    from ancient_arch_extractor import FEATURE_KEYS, UnreadableImageError
+    from mlp_inference import MLPInference
+
+    rng = np.random.default_rng(0)
+    X, y = rng.normal(size=(20, len(FEATURE_KEYS))), np.arange(20) % 2
+    inference = MLPInference()
+    inference.scaler = StandardScaler().fit(X)
+    inference.model = MLPClassifier(hidden_layer_sizes=(4,), max_iter=20).fit(X, y)
+
+    with pytest.raises(UnreadableImageError):
+        inference.predict_from_bytes(NOT_AN_IMAGE, summary=False)
+    assert inference.predict_from_bytes(encoded_image(), summary=False)["success"] is True
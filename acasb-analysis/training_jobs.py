@@ -0,0 +1,507 @@
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import re
+import signal
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field, fields
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: only jobs of one server process are serialized.
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_DIR = str((Path(__file__).resolve().parent / "cache" / "train_jobs").resolve())
+DEFAULT_HISTORY = 20
+DEFAULT_NICE = 10
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{12}")
+
+# A cancelled job gets this long to stop at its next progress report before
+# its process group is terminated. Jobs already saving are never killed.
+CANCEL_GRACE_SECONDS = 5.0
+# Progress messages are sent at most this often (phase changes always go out).
+REPORT_INTERVAL = 0.2
+POLL_INTERVAL = 0.5
+
+
+class JobCancelled(Exception):
+    """Raised inside the job process when the job was cancelled."""
+
+
+class JobContext:
+    """
+    Handed to the training function inside the job process: progress
+    reporting, cooperative cancellation and the CPU budget to use.
+    """
+
+    def __init__(self, messages, cancel_event, cpus: int):
+        self._messages = messages
+        self._cancel_event = cancel_event
+        self._last_sent = 0.0
+        self._phase: Optional[str] = None
+        self.cpus = cpus
+
+    def report(self, phase: Optional[str] = None, **progress: Any) -> None:
+        """
+        Update progress (``phase``, ``images_done``, ``images_total``,
+        ``fold``, ``folds``). Raises ``JobCancelled`` once the job was
+        cancelled, so long loops stop at their next report.
+        """
+        self.check_cancelled()
+        phase = phase or self._phase
+        progress["phase"] = phase
+        now = time.monotonic()
+        final = (
+            progress.get("images_done") == progress.get("images_total", -1)
+            or progress.get("fold") == progress.get("folds", -1)
+        )
+        if phase == self._phase and not final and now - self._last_sent < REPORT_INTERVAL:
+            return
+        self._phase = phase
+        self._last_sent = now
+        self._messages.put(("progress", progress))
+
+    def check_cancelled(self) -> None:
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+
+@dataclass
+class TrainingJob:
+    job_id: str
+    model_type: str
+    # JSON-safe copy of the request, shown in job listings.
+    params: Dict[str, Any] = field(default_factory=dict)
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    phase: Optional[str] = None
+    phase_started: Optional[float] = None
+    images_done: int = 0
+    images_total: int = 0
+    fold: int = 0
+    folds: int = 0
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    # Server process supervising the job, and the job process itself.
+    owner_pid: Optional[int] = None
+    pid: Optional[int] = None
+
+    def update(self, progress: Dict[str, Any]) -> None:
+        phase = progress.get("phase")
+        if phase is not None and phase != self.phase:
+            self.phase = phase
+            self.phase_started = time.time()
+        for key in ("images_done", "images_total", "fold", "folds"):
+            if key in progress:
+                setattr(self, key, int(progress[key]))
+
+    def eta_seconds(self) -> Optional[float]:
+        """Estimated time left in the current phase (extraction or CV), from its rate so far."""
+        if self.status != "running" or self.phase_started is None:
+            return None
+        spent = time.time() - self.phase_started
+        if self.phase == "extracting" and self.images_done > 0:
+            return spent / self.images_done * max(0, self.images_total - self.images_done)
+        if self.phase == "cross_validating" and self.fold > 1:
+            return spent / (self.fold - 1) * (self.folds - self.fold + 1)
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        eta = self.eta_seconds()
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "model_type": self.model_type,
+            "params": self.params,
+            "phase": self.phase,
+            "images_done": self.images_done,
+            "images_total": self.images_total,
+            "fold": self.fold,
+            "folds": self.folds,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": round(end - self.started_at, 3) if self.started_at else 0.0,
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if pid is None or os.name != "posix":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _limit_resources(nice: int, cpus: int) -> None:
+    # Runs first thing in the job process: lead a new process group (so the
+    # extraction pool can be stopped with it), lower the scheduling priority
+    # and cap BLAS/OpenMP/OpenCV/torch threads so serving keeps its cores.
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+    if nice > 0 and hasattr(os, "nice"):
+        os.nice(nice)
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(cpus)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(cpus)
+    except ImportError:
+        pass
+    cv2 = sys.modules.get("cv2")
+    if cv2 is not None:
+        cv2.setNumThreads(cpus)
+
+
+def _run_job(target: Callable[[Any, JobContext], Dict], request: Any, messages, cancel_event, nice: int, cpus: int) -> None:
+    _limit_resources(nice, cpus)
+    try:
+        result = target(request, JobContext(messages, cancel_event, cpus))
+        messages.put(("succeeded", result))
+    except JobCancelled:
+        messages.put(("cancelled", None))
+    except BaseException as e:
+        # Errors carrying a detail (api_server.ApiError) keep their message.
+        messages.put(("failed", getattr(e, "detail", None) or f"Training failed: {e}"))
+
+
+class TrainingJobs:
+    """
+    Runs training requests as background jobs, one at a time, each in its
+    own spawned process so a long fit never holds a request worker and a
+    crash cannot take the server down.
+
+    ``target(request, context)`` is a picklable module-level function. It
+    reports progress and notices cancellation through the ``JobContext``.
+    The job process runs at lower priority (``nice``) with its thread pools
+    capped at ``cpus``.
+
+    Job state is kept as one JSON file per job in ``job_dir``, so with
+    several server workers any of them can report on or cancel a job
+    another one started; a lock file keeps to one running job across them.
+    The newest ``history`` finished jobs are kept.
+    """
+
+    def __init__(
+        self,
+        target: Callable[[Any, JobContext], Dict],
+        job_dir: str = DEFAULT_JOB_DIR,
+        history: int = DEFAULT_HISTORY,
+        nice: int = DEFAULT_NICE,
+        cpus: Optional[int] = None,
+    ):
+        self.target = target
+        self.job_dir = job_dir
+        self.history = max(1, history)
+        self.nice = max(0, nice)
+        self.cpus = max(1, cpus or (os.cpu_count() or 1) // 2)
+        # Jobs supervised by this process.
+        self._jobs: Dict[str, TrainingJob] = {}
+        self._cancel_events: Dict[str, Any] = {}
+        self._processes: Dict[str, multiprocessing.process.BaseProcess] = {}
+        self._lock = threading.Lock()
+        self._slot = threading.Lock()
+        self._context = multiprocessing.get_context("spawn")
+        self._closed = False
+
+    @classmethod
+    def from_env(cls, target: Callable[[Any, JobContext], Dict]) -> "TrainingJobs":
+        """
+        Build from ``ACASB_TRAIN_JOB_DIR``, ``ACASB_TRAIN_JOB_HISTORY``,
+        ``ACASB_TRAIN_NICE`` and ``ACASB_TRAIN_CPUS``.
+        """
+        def int_env(name: str, default: int) -> int:
+            try:
+                return int(os.getenv(name, str(default)).strip() or default)
+            except ValueError:
+                return default
+
+        return cls(
+            target,
+            job_dir=os.getenv("ACASB_TRAIN_JOB_DIR", "").strip() or DEFAULT_JOB_DIR,
+            history=int_env("ACASB_TRAIN_JOB_HISTORY", DEFAULT_HISTORY),
+            nice=int_env("ACASB_TRAIN_NICE", DEFAULT_NICE),
+            cpus=int_env("ACASB_TRAIN_CPUS", 0) or None,
+        )
+
+    def submit(self, request: Any, model_type: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        os.makedirs(self.job_dir, exist_ok=True)
+        job = TrainingJob(job_id=uuid.uuid4().hex[:12], model_type=model_type, params=params or {}, owner_pid=os.getpid())
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._cancel_events[job.job_id] = self._context.Event()
+            self._save(job)
+        threading.Thread(
+            target=self._supervise,
+            args=(job, request),
+            name=f"acasb-train-{job.job_id}",
+            daemon=True
+        ).start()
+        logger.info(f"Queued {model_type} training job {job.job_id}")
+        return job.snapshot()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._find(job_id)
+        return job.snapshot() if job is not None else None
+
+    def list(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Most recent first."""
+        jobs = sorted(self._all(), key=lambda job: job.created_at, reverse=True)
+        if limit:
+            jobs = jobs[:limit]
+        return [job.snapshot() for job in jobs]
+
+    def counts(self) -> Dict[str, int]:
+        counts = {status: 0 for status in JOB_STATUSES}
+        for job in self._all():
+            counts[job.status] += 1
+        return counts
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Request cancellation; returns the job's state, or None if it is unknown."""
+        job = self._find(job_id)
+        if job is None or job.status in FINISHED_STATUSES:
+            return job.snapshot() if job is not None else None
+        with self._lock:
+            local = self._jobs.get(job_id)
+            if local is not None:
+                self._cancel_events[job_id].set()
+                if local.status == "queued":
+                    local.status = "cancelled"
+                    local.finished_at = time.time()
+                    self._save(local)
+                job = local
+            else:
+                # Owned by another worker, which picks the marker up.
+                Path(self._path(job_id, ".cancel")).touch()
+        logger.info(f"Cancellation requested for training job {job_id}")
+        return job.snapshot()
+
+    def shutdown(self) -> None:
+        """Cancel this process's queued and running jobs and stop their processes."""
+        self._closed = True
+        with self._lock:
+            job_ids = list(self._jobs)
+            processes = list(self._processes.values())
+        for job_id in job_ids:
+            self.cancel(job_id)
+        for process in processes:
+            self._terminate(process)
+        with self._lock:
+            # The supervising threads die with the server; record the outcome.
+            for job in self._jobs.values():
+                if job.status not in FINISHED_STATUSES:
+                    self._finish(job, "cancelled")
+
+    def _path(self, job_id: str, suffix: str = ".json") -> str:
+        return os.path.join(self.job_dir, job_id + suffix)
+
+    def _save(self, job: TrainingJob) -> None:
+        # Caller holds self._lock.
+        path = self._path(job.job_id)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(asdict(job), f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Cannot write training job state {path}: {e}")
+
+    def _read(self, path: str) -> Optional[TrainingJob]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        known = {item.name for item in fields(TrainingJob)}
+        job = TrainingJob(**{key: value for key, value in data.items() if key in known})
+        if job.status not in FINISHED_STATUSES and not _pid_alive(job.owner_pid):
+            job.status = "failed"
+            job.error = "Server stopped before the job finished"
+            job.finished_at = job.finished_at or os.path.getmtime(path)
+        return job
+
+    def _find(self, job_id: str) -> Optional[TrainingJob]:
+        if not JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job if job is not None else self._read(self._path(job_id))
+
+    def _all(self) -> List[TrainingJob]:
+        with self._lock:
+            jobs = dict(self._jobs)
+        try:
+            names = os.listdir(self.job_dir)
+        except OSError:
+            names = []
+        for name in names:
+            job_id, ext = os.path.splitext(name)
+            if ext == ".json" and job_id not in jobs and JOB_ID_PATTERN.fullmatch(job_id):
+                job = self._read(os.path.join(self.job_dir, name))
+                if job is not None:
+                    jobs[job_id] = job
+        return list(jobs.values())
+
+    def _trim(self) -> None:
+        finished = sorted(
+            (job for job in self._all() if job.status in FINISHED_STATUSES),
+            key=lambda job: job.created_at,
+            reverse=True
+        )
+        for job in finished[self.history:]:
+            for suffix in (".json", ".cancel"):
+                try:
+                    os.remove(self._path(job.job_id, suffix))
+                except OSError:
+                    pass
+
+    @contextmanager
+    def _running_slot(self) -> Iterator[None]:
+        # One job at a time in this process, and across server workers.
+        with self._slot:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.job_dir, "running.lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _cancel_marked(self, job: TrainingJob) -> bool:
+        if os.path.exists(self._path(job.job_id, ".cancel")):
+            self._cancel_events[job.job_id].set()
+        return self._cancel_events[job.job_id].is_set()
+
+    def _supervise(self, job: TrainingJob, request: Any) -> None:
+        try:
+            with self._running_slot():
+                with self._lock:
+                    if job.status != "queued":
+                        return
+                    if self._closed or self._cancel_marked(job):
+                        self._finish(job, "cancelled")
+                        return
+                    job.status = "running"
+                    job.started_at = time.time()
+                    self._save(job)
+                    messages = self._context.Queue()
+                    # Not daemonic: the job starts worker processes of its own
+                    # (the extraction pool). shutdown() stops it with the server.
+                    process = self._context.Process(
+                        target=_run_job,
+                        args=(self.target, request, messages, self._cancel_events[job.job_id], self.nice, self.cpus),
+                        name=f"acasb-train-{job.job_id}",
+                        daemon=False
+                    )
+                try:
+                    process.start()
+                except Exception as e:
+                    logger.error(f"Cannot start training job {job.job_id}: {e}")
+                    with self._lock:
+                        self._finish(job, "failed", error=str(e))
+                    return
+                with self._lock:
+                    job.pid = process.pid
+                    self._processes[job.job_id] = process
+                try:
+                    self._follow(job, process, messages)
+                finally:
+                    process.join(timeout=1)
+                    with self._lock:
+                        self._processes.pop(job.job_id, None)
+        finally:
+            with self._lock:
+                self._jobs.pop(job.job_id, None)
+                self._cancel_events.pop(job.job_id, None)
+            self._trim()
+
+    def _follow(self, job: TrainingJob, process, messages) -> None:
+        cancel_deadline: Optional[float] = None
+        while True:
+            try:
+                kind, payload = messages.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                kind, payload = None, None
+
+            with self._lock:
+                if job.status in FINISHED_STATUSES:
+                    return
+                if kind == "progress":
+                    job.update(payload)
+                    self._save(job)
+                elif kind == "succeeded":
+                    self._finish(job, "succeeded", result=payload)
+                    return
+                elif kind == "cancelled":
+                    self._finish(job, "cancelled")
+                    return
+                elif kind == "failed":
+                    self._finish(job, "failed", error=payload)
+                    return
+                cancelled = self._cancel_marked(job)
+                if kind is None and not process.is_alive():
+                    if cancelled:
+                        self._finish(job, "cancelled")
+                    else:
+                        self._finish(job, "failed", error=f"Training process exited with code {process.exitcode}")
+                    return
+
+            if cancelled and job.phase != "saving":
+                cancel_deadline = cancel_deadline or time.monotonic() + CANCEL_GRACE_SECONDS
+                if time.monotonic() > cancel_deadline:
+                    logger.warning(f"Training job {job.job_id} did not stop, terminating it")
+                    self._terminate(process)
+
+    def _finish(self, job: TrainingJob, status: str, result: Optional[Dict] = None, error: Optional[str] = None) -> None:
+        # Caller holds self._lock.
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        self._save(job)
+        elapsed = job.finished_at - (job.started_at or job.finished_at)
+        if status == "failed":
+            logger.error(f"Training job {job.job_id} failed after {elapsed:.1f}s: {error}")
+        else:
+            logger.info(f"Training job {job.job_id} {status} after {elapsed:.1f}s")
+
+    @staticmethod
+    def _terminate(process) -> None:
+        if not process.is_alive():
+            return
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(process.pid, signal.SIGTERM)
+            else:
+                process.terminate()
+        except (ProcessLookupError, PermissionError):
+            process.terminate()
+        process.join(timeout=CANCEL_GRACE_SECONDS)
+        if process.is_alive():
+            process.kill()
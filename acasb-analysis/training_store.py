@@ -0,0 +1,233 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = str((Path(__file__).resolve().parent / "cache").resolve())
+DEFAULT_CHUNK_SIZE = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS training_features (
+    namespace TEXT NOT NULL,
+    version TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    dtype TEXT NOT NULL,
+    views INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (namespace, version, path)
+);
+"""
+
+# extract(paths, progress) -> one (views, dim) array per path, None where it failed.
+ExtractFn = Callable[[List[str], Callable[[int], None]], List[Optional[np.ndarray]]]
+
+
+def file_digest(path: str) -> str:
+    hasher = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class TrainingFeatureStore:
+    """
+    Persistent per-image feature rows for training sets, so a retrain only
+    extracts images that are new or changed.
+
+    A row is keyed by ``(namespace, version, path)`` and records the file's
+    size, mtime and content hash. A file whose size and mtime match is reused
+    without being read; one whose stat changed is hashed and reused if the
+    content is the same (touched, copied over); a new path whose content is
+    already stored under another path (renamed, moved) is reused too. A row
+    holds all views of an image (the base view, then augmented ones), so a
+    hybrid retrain also reuses the augmented samples. ``version`` must change
+    whenever the extractor would produce different values.
+
+    Unlike ``FeatureCache`` nothing is evicted: rows are dropped only when
+    their file no longer exists. Storage is SQLite (WAL) next to the feature
+    cache; read or write errors are logged and fall back to extraction.
+    """
+
+    def __init__(self, store_dir: str = DEFAULT_STORE_DIR, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.store_dir = store_dir
+        self.chunk_size = max(1, chunk_size)
+        self.db_path = os.path.join(store_dir, "training_features.sqlite3")
+        self._local = threading.local()
+
+    @classmethod
+    def from_env(cls) -> Optional["TrainingFeatureStore"]:
+        """
+        Build from ``ACASB_TRAIN_STORE`` (``0`` / ``false`` disables) and
+        ``ACASB_TRAIN_STORE_DIR`` (default: the feature cache directory).
+        """
+        if os.getenv("ACASB_TRAIN_STORE", "1").strip().lower() in ("0", "false", "no", "off"):
+            return None
+        store_dir = (
+            os.getenv("ACASB_TRAIN_STORE_DIR", "").strip()
+            or os.getenv("ACASB_FEATURE_CACHE_DIR", "").strip()
+            or DEFAULT_STORE_DIR
+        )
+        return cls(store_dir)
+
+    def __getstate__(self):
+        return {"store_dir": self.store_dir, "chunk_size": self.chunk_size}
+
+    def __setstate__(self, state):
+        self.__init__(state["store_dir"], state["chunk_size"])
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        os.makedirs(self.store_dir, exist_ok=True)
+        connection = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(_SCHEMA)
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def load_or_extract(
+        self,
+        namespace: str,
+        version: str,
+        paths: Sequence[str],
+        extract: ExtractFn,
+        views: int = 1,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> Tuple[List[Optional[np.ndarray]], int]:
+        """
+        Return ``(rows, reused)``: a ``(views, dim)`` array per path (None
+        where extraction failed) and how many came from the store.
+
+        Missing or changed images go to ``extract`` in chunks of
+        ``chunk_size`` and each chunk is stored as soon as it is done, so an
+        interrupted run keeps what it finished. ``progress(done)`` counts
+        reused images first, then extracted ones.
+        """
+        paths = [str(Path(path).resolve()) for path in paths]
+        rows: List[Optional[np.ndarray]] = [None] * len(paths)
+        stats: Dict[int, Tuple[int, int]] = {}
+        digests: Dict[int, str] = {}
+        missing: List[int] = []
+        # Reused rows whose file was touched, renamed or copied: new stat/path.
+        relinked: List[tuple] = []
+
+        stored = self._stored(namespace, version)
+        by_digest = {row[2]: row for row in stored.values()}
+        for index, path in enumerate(paths):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                missing.append(index)
+                continue
+            stats[index] = (stat.st_size, stat.st_mtime_ns)
+            row = stored.get(path)
+            if row is not None and (row[0], row[1]) == stats[index] and row[3] >= views:
+                rows[index] = row[4][:views]
+                continue
+            try:
+                digests[index] = file_digest(path)
+            except OSError:
+                missing.append(index)
+                continue
+            match = by_digest.get(digests[index])
+            if match is not None and match[3] >= views:
+                rows[index] = match[4][:views]
+                relinked.append((path, stats[index], digests[index], match[4]))
+            else:
+                missing.append(index)
+        self._write(namespace, version, relinked)
+
+        reused = len(paths) - len(missing)
+        if progress is not None:
+            progress(reused)
+
+        for start in range(0, len(missing), self.chunk_size):
+            chunk = missing[start:start + self.chunk_size]
+            offset = reused + start
+            extracted = extract(
+                [paths[index] for index in chunk],
+                (lambda done: progress(offset + done)) if progress is not None else (lambda done: None),
+            )
+            records = []
+            for index, features in zip(chunk, extracted):
+                if features is None:
+                    continue
+                features = np.atleast_2d(features)
+                rows[index] = features
+                if index in digests:
+                    records.append((paths[index], stats[index], digests[index], features))
+            self._write(namespace, version, records)
+
+        self._prune(namespace, version, stored, set(paths))
+        logger.info(f"Training features ({namespace}): {reused} reused ({len(relinked)} rehashed), {len(missing)} extracted")
+        return rows, reused
+
+    def _stored(self, namespace: str, version: str) -> Dict[str, tuple]:
+        """{path: (size, mtime_ns, digest, views, features)} for this namespace and version."""
+        try:
+            cursor = self._connection().execute(
+                "SELECT path, size, mtime_ns, digest, dtype, views, data FROM training_features "
+                "WHERE namespace = ? AND version = ?",
+                (namespace, version),
+            )
+            stored = {}
+            for path, size, mtime_ns, digest, dtype, views, data in cursor:
+                features = np.frombuffer(data, dtype=np.dtype(dtype)).reshape(views, -1).copy()
+                stored[path] = (size, mtime_ns, digest, views, features)
+            return stored
+        except sqlite3.Error as e:
+            logger.warning(f"Training feature store read failed: {e}")
+            return {}
+
+    def _write(self, namespace: str, version: str, records: List[tuple]) -> None:
+        if not records:
+            return
+        now = time.time()
+        try:
+            connection = self._connection()
+            with connection:
+                connection.execute("BEGIN")
+                connection.executemany(
+                    "INSERT OR REPLACE INTO training_features "
+                    "(namespace, version, path, size, mtime_ns, digest, dtype, views, data, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (namespace, version, path, stat[0], stat[1], digest,
+                         features.dtype.str, features.shape[0], np.ascontiguousarray(features).tobytes(), now)
+                        for path, stat, digest, features in records
+                    ],
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Training feature store write failed: {e}")
+
+    def _prune(self, namespace: str, version: str, stored: Dict[str, tuple], current: set) -> None:
+        # Rows of other datasets stay; only files that are gone are dropped.
+        gone = [path for path in stored if path not in current and not os.path.exists(path)]
+        if not gone:
+            return
+        try:
+            connection = self._connection()
+            with connection:
+                connection.execute("BEGIN")
+                connection.executemany(
+                    "DELETE FROM training_features WHERE namespace = ? AND version = ? AND path = ?",
+                    [(namespace, version, path) for path in gone],
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Training feature store prune failed: {e}")
@@ -93,7 +93,7 @@ def create_readme(temp_dir):
 
 	启动脚本说明：
 	- start_java.* 会自动读取 config.properties 并传给 Spring Boot
-	- start_python.* 会自动读取 python.host / python.port
+	- start_python.* 会自动读取 python.host / python.port / python.workers
 
 ### 2. 启动后端服务
 - Windows: 双击 start_java.bat
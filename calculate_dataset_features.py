@@ -18,13 +18,12 @@ def format_value(value, decimals=4):
     format_str = "{:." + str(decimals) + "f}"
     return format_str.format(value)
 
-def extract_features(image_path):
+def get_extractor():
     sys.path.append(os.path.join(os.path.dirname(__file__), 'acasb-analysis'))
     from ancient_arch_extractor import AncientArchExtractor
+    from feature_cache import FeatureCache
     
-    extractor = AncientArchExtractor()
-    features, _ = extractor.extract_features(image_path)
-    return features
+    return AncientArchExtractor(feature_cache=FeatureCache.from_env())
 
 def process_dataset(dataset_path, label):
     print(f"\n正在处理数据集: {dataset_path}")
@@ -44,24 +43,20 @@ def process_dataset(dataset_path, label):
     
     print(f"  找到 {total_files} 张图片")
     
+    extractor = get_extractor()
+    from ancient_arch_extractor import FEATURE_KEYS, STATUS_OK
+    
+    image_paths = [os.path.join(dataset_path, filename) for filename in image_files]
+    feature_matrix, status = extractor.extract_features_batch(image_paths)
+    
     all_features = []
     failed_count = 0
     
-    for idx, filename in enumerate(image_files, 1):
-        image_path = os.path.join(dataset_path, filename)
-        
-        try:
-            features = extract_features(image_path)
-            
-            if features:
-                all_features.append(features)
-                if idx % 20 == 0:
-                    print(f"  进度: {idx}/{total_files} ({idx*100//total_files}%)")
-            else:
-                print(f"  ✗ 处理失败: {filename}")
-                failed_count += 1
-        except Exception as e:
-            print(f"  ✗ 处理失败: {filename} - {str(e)}")
+    for filename, row, row_status in zip(image_files, feature_matrix, status):
+        if row_status == STATUS_OK:
+            all_features.append({key: float(value) for key, value in zip(FEATURE_KEYS, row)})
+        else:
+            print(f"  ✗ 处理失败: {filename}")
             failed_count += 1
     
     print(f"\n成功处理: {len(all_features)} 张图片")
@@ -1,8 +1,13 @@
 package com.leeinx.acasb;
 
+import com.fasterxml.jackson.annotation.JsonInclude;
+
 public class PredictionRequest {
     private String image_path;
 
+    @JsonInclude(JsonInclude.Include.NON_NULL)
+    private String model_type;
+
     public PredictionRequest() {
     }
 
@@ -10,6 +15,11 @@ public class PredictionRequest {
         this.image_path = image_path;
     }
 
+    public PredictionRequest(String image_path, String model_type) {
+        this.image_path = image_path;
+        this.model_type = model_type;
+    }
+
     public String getImage_path() {
         return image_path;
     }
@@ -17,4 +27,12 @@ public class PredictionRequest {
     public void setImage_path(String image_path) {
         this.image_path = image_path;
     }
+
+    public String getModel_type() {
+        return model_type;
+    }
+
+    public void setModel_type(String model_type) {
+        this.model_type = model_type;
+    }
 }
\ No newline at end of file
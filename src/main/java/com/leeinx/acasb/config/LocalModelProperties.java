@@ -9,4 +9,5 @@ import org.springframework.stereotype.Component;
 @ConfigurationProperties(prefix = "local.model")
 public class LocalModelProperties {
     private boolean predictionEnabled = false;
+    private String modelType = "mlp";
 }
@@ -11,6 +11,11 @@ public class PythonServiceProperties {
     private String scheme = "http";
     private String host = "localhost";
     private int port = 5000;
+    /**
+     * 为 true 时把图片内容直接上传给 Python 的 upload 系列接口，
+     * Python 服务不必与 Java 共享文件系统。
+     */
+    private boolean uploadImages = false;
 
     public String buildUrl(String path) {
         String normalizedPath = path.startsWith("/") ? path : "/" + path;
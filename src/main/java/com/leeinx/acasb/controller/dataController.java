@@ -3,7 +3,6 @@ package com.leeinx.acasb.controller;
 import com.leeinx.acasb.config.LocalModelProperties;
 import com.leeinx.acasb.dto.AiAnalyzeResult;
 import com.leeinx.acasb.dto.BatchUploadResult;
-import com.leeinx.acasb.dto.ImageAnalysisResult;
 import com.leeinx.acasb.dto.ImageFeatures;
 import com.leeinx.acasb.entity.BuildingAnalysis;
 import com.leeinx.acasb.entity.BuildingType;
@@ -199,7 +198,11 @@ public class dataController {
     }
 
     private ProcessedImageData processStoredImage(Path storedPath, Boolean enableAi) {
-        ImageFeatures imageFeatures = pythonAnalysisClient.analyze(storedPath.toString());
+        boolean predictionEnabled = localModelProperties.isPredictionEnabled();
+        // 启用本地模型时走 /analyze_predict，特征只提取一次
+        ImageFeatures imageFeatures = predictionEnabled
+                ? pythonAnalysisClient.analyzeAndPredict(storedPath.toString(), localModelProperties.getModelType())
+                : pythonAnalysisClient.analyze(storedPath.toString());
         if (imageFeatures == null || !imageFeatures.isSuccess()) {
             throw new IllegalStateException("图像分析失败");
         }
@@ -215,16 +218,15 @@ public class dataController {
         BuildingAnalysis savedAnalysis = buildingAnalysisService.saveAnalysis(analysis);
 
         BuildingType savedType = null;
-        if (localModelProperties.isPredictionEnabled()) {
-            ImageAnalysisResult predictionResult = pythonAnalysisClient.predict(storedPath.toString());
-            if (predictionResult != null && predictionResult.isSuccess()) {
-                BuildingType buildingType = new BuildingType();
-                buildingType.setImagePath(storedPath.toString());
-                buildingType.setPrediction(predictionResult.getPrediction());
-                buildingType.setConfidence(predictionResult.getConfidence());
-                buildingType.setAnalysisId(savedAnalysis.getId());
-                savedType = buildingTypeService.saveType(buildingType);
-            }
+        if (predictionEnabled
+                && Boolean.TRUE.equals(imageFeatures.getPredictionSuccess())
+                && imageFeatures.getConfidence() != null) {
+            BuildingType buildingType = new BuildingType();
+            buildingType.setImagePath(storedPath.toString());
+            buildingType.setPrediction(imageFeatures.getPrediction());
+            buildingType.setConfidence(imageFeatures.getConfidence());
+            buildingType.setAnalysisId(savedAnalysis.getId());
+            savedType = buildingTypeService.saveType(buildingType);
         }
 
         return new ProcessedImageData(imageFeatures, savedAnalysis, savedType);
@@ -11,6 +11,15 @@ public class ImageFeatures {
     private String prediction;
     private Double confidence;
 
+    @JsonProperty("model_type")
+    private String modelType;
+
+    @JsonProperty("prediction_success")
+    private Boolean predictionSuccess;
+
+    @JsonProperty("prediction_message")
+    private String predictionMessage;
+
     @JsonProperty("ai_analyze")
     private String aiAnalyze;
 
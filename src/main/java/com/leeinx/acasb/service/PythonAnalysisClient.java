@@ -4,8 +4,19 @@ import com.leeinx.acasb.PredictionRequest;
 import com.leeinx.acasb.config.PythonServiceProperties;
 import com.leeinx.acasb.dto.ImageAnalysisResult;
 import com.leeinx.acasb.dto.ImageFeatures;
+import org.springframework.http.HttpEntity;
+import org.springframework.http.HttpHeaders;
+import org.springframework.http.MediaType;
 import org.springframework.stereotype.Service;
 import org.springframework.web.client.RestTemplate;
+import org.springframework.web.util.UriComponentsBuilder;
+
+import java.io.IOException;
+import java.io.UncheckedIOException;
+import java.net.URI;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.nio.file.Paths;
 
 @Service
 public class PythonAnalysisClient {
@@ -18,6 +29,9 @@ public class PythonAnalysisClient {
     }
 
     public ImageFeatures analyze(String imagePath) {
+        if (pythonServiceProperties.isUploadImages()) {
+            return postImage("/analyze/upload", imagePath, null, ImageFeatures.class);
+        }
         return restTemplate.postForObject(
                 pythonServiceProperties.buildUrl("/analyze"),
                 new PredictionRequest(imagePath),
@@ -25,11 +39,48 @@ public class PythonAnalysisClient {
         );
     }
 
+    /**
+     * 一次特征提取同时返回 /analyze 的特征字段和本地模型预测结果。
+     */
+    public ImageFeatures analyzeAndPredict(String imagePath, String modelType) {
+        if (pythonServiceProperties.isUploadImages()) {
+            return postImage("/analyze_predict/upload", imagePath, modelType, ImageFeatures.class);
+        }
+        return restTemplate.postForObject(
+                pythonServiceProperties.buildUrl("/analyze_predict"),
+                new PredictionRequest(imagePath, modelType),
+                ImageFeatures.class
+        );
+    }
+
     public ImageAnalysisResult predict(String imagePath) {
+        if (pythonServiceProperties.isUploadImages()) {
+            return postImage("/predict/upload", imagePath, null, ImageAnalysisResult.class);
+        }
         return restTemplate.postForObject(
                 pythonServiceProperties.buildUrl("/predict"),
                 new PredictionRequest(imagePath),
                 ImageAnalysisResult.class
         );
     }
+
+    private <T> T postImage(String path, String imagePath, String modelType, Class<T> responseType) {
+        Path file = Paths.get(imagePath);
+        byte[] content;
+        try {
+            content = Files.readAllBytes(file);
+        } catch (IOException e) {
+            throw new UncheckedIOException("读取图片失败: " + imagePath, e);
+        }
+
+        UriComponentsBuilder builder = UriComponentsBuilder.fromUriString(pythonServiceProperties.buildUrl(path));
+        if (modelType != null) {
+            builder.queryParam("model_type", modelType);
+        }
+        URI uri = builder.build().encode().toUri();
+
+        HttpHeaders headers = new HttpHeaders();
+        headers.setContentType(MediaType.APPLICATION_OCTET_STREAM);
+        return restTemplate.postForObject(uri, new HttpEntity<>(content, headers), responseType);
+    }
 }
@@ -6,16 +6,20 @@ set "PROJECT_DIR=%SCRIPT_DIR%acasb-analysis"
 set "CONFIG_FILE=%SCRIPT_DIR%config.properties"
 set "PYTHON_HOST=127.0.0.1"
 set "PYTHON_PORT=5000"
+set "PYTHON_WORKERS=1"
 
 if exist "%CONFIG_FILE%" (
   for /f "usebackq eol=# tokens=1,* delims==" %%A in ("%CONFIG_FILE%") do (
     if /I "%%A"=="python.host" set "PYTHON_HOST=%%B"
     if /I "%%A"=="python.port" set "PYTHON_PORT=%%B"
+    if /I "%%A"=="python.workers" set "PYTHON_WORKERS=%%B"
   )
 )
 
 set "ACASB_PYTHON_HOST=%PYTHON_HOST%"
 set "ACASB_PYTHON_PORT=%PYTHON_PORT%"
+rem Windows has no fork(); api_server.py falls back to a single worker.
+set "ACASB_PYTHON_WORKERS=%PYTHON_WORKERS%"
 
 echo Starting Python API Service...
 echo.
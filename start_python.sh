@@ -41,9 +41,11 @@ fi
 
 PYTHON_HOST="$(read_prop "python.host" "127.0.0.1")"
 PYTHON_PORT="$(read_prop "python.port" "5000")"
+PYTHON_WORKERS="$(read_prop "python.workers" "1")"
 
 export ACASB_PYTHON_HOST="$PYTHON_HOST"
 export ACASB_PYTHON_PORT="$PYTHON_PORT"
+export ACASB_PYTHON_WORKERS="$PYTHON_WORKERS"
 
 if [[ -x "${PROJECT_DIR}/.venv/bin/python" ]]; then
   PYTHON_BIN="${PROJECT_DIR}/.venv/bin/python"
@@ -72,4 +74,5 @@ fi
 echo "Python service started"
 echo "PID: ${PYTHON_PID}"
 echo "Target: ${PYTHON_HOST}:${PYTHON_PORT}"
+echo "Workers: ${PYTHON_WORKERS}"
 echo "Log file: ${LOG_FILE}"